@@ -71,9 +71,14 @@ class BankAccountCommand(Command):
             return
 
         if self.action == Action.DEPOSIT:
-            self.account.withdraw(self.amount)
+            # Taking a deposit back can hit the overdraft limit; then the
+            # command stays applied and can be undone again later
+            if not self.account.withdraw(self.amount):
+                return
         elif self.action == Action.WITHDRAW:
             self.account.deposit(self.amount)
+        # Undone: a second undo (e.g. through a batch holding it) is a no-op
+        self.success = False
 
 
 class CompositeBankAccountCommand(Command):
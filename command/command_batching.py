@@ -0,0 +1,184 @@
+from contextlib import redirect_stdout
+import io
+import time
+import unittest
+
+from command1 import (Action, BankAccount, BankAccountCommand, Command,
+                      MoneyTransferCommans)
+
+
+class DepositBatchCommand(Command):
+    """
+    Several deposits into one account applied as a single deposit.
+    The original commands are kept, so each of them still reports its own
+    success and can be undone on its own instead of undoing the batch.
+    """
+
+    def __init__(self, account, commands=None):
+        super().__init__()
+        self.account = account
+        self.commands = list(commands) if commands else []
+
+    @property
+    def amount(self):
+        return sum(cmd.amount for cmd in self.commands)
+
+    def invoke(self):
+        self.account.deposit(self.amount)
+        for cmd in self.commands:
+            cmd.success = True
+        self.success = True
+
+    def undo(self):
+        if not self.success:
+            return
+        # One by one in reverse, like undoing the original commands: under
+        # OVERDRAFT_LIMIT one withdrawal of the sum could be refused where
+        # some of the members can still be taken back. Members undone
+        # earlier on their own are skipped by their own undo().
+        for cmd in reversed(self.commands):
+            cmd.undo()
+        self.success = any(cmd.success for cmd in self.commands)
+
+
+class CommandBatcher:
+    """
+    Merges deposits into the same account until something else touches it.
+
+    A withdrawal is never merged: its success depends on the exact balance
+    and OVERDRAFT_LIMIT. Deposits always succeed, and since the run of
+    deposits is closed by the next withdrawal or transfer on that account,
+    moving them together can not change any other command's result.
+    """
+
+    def __init__(self):
+        self.raw_count = 0
+        self.batched_count = 0
+
+    @property
+    def reduction_ratio(self):
+        """Raw commands per applied command (1.0 means nothing merged)."""
+        if not self.batched_count:
+            return 1.0
+        return self.raw_count / self.batched_count
+
+    def batch(self, commands):
+        result = []
+        open_runs = {}
+
+        for cmd in commands:
+            if isinstance(cmd, BankAccountCommand) and cmd.action == Action.DEPOSIT:
+                run = open_runs.get(cmd.account)
+                if run is None:
+                    run = DepositBatchCommand(cmd.account)
+                    open_runs[cmd.account] = run
+                    result.append(run)
+                run.commands.append(cmd)
+            elif isinstance(cmd, BankAccountCommand):
+                open_runs.pop(cmd.account, None)
+                result.append(cmd)
+            elif isinstance(cmd, MoneyTransferCommans):
+                for sub in cmd.commands:
+                    open_runs.pop(sub.account, None)
+                result.append(cmd)
+            else:
+                # Unknown command, it may touch any account
+                open_runs.clear()
+                result.append(cmd)
+
+        # A run of one deposit is just the deposit itself
+        result = [c.commands[0] if isinstance(c, DepositBatchCommand) and len(c.commands) == 1
+                  else c for c in result]
+        self.raw_count += len(commands)
+        self.batched_count += len(result)
+        return result
+
+
+class TestSuite(unittest.TestCase):
+
+    def test_deposits_merged_until_withdraw(self):
+        ba = BankAccount()
+        other = BankAccount()
+        commands = [BankAccountCommand(ba, Action.DEPOSIT, 100),
+                    BankAccountCommand(other, Action.DEPOSIT, 10),
+                    BankAccountCommand(ba, Action.DEPOSIT, 50),
+                    BankAccountCommand(ba, Action.WITHDRAW, 600),
+                    BankAccountCommand(ba, Action.DEPOSIT, 25)]
+        batcher = CommandBatcher()
+        batched = batcher.batch(commands)
+        self.assertEqual(len(batched), 4)
+        self.assertAlmostEqual(batcher.reduction_ratio, 5 / 4)
+
+        with redirect_stdout(io.StringIO()):
+            for cmd in batched:
+                cmd.invoke()
+        self.assertEqual(ba.balance, -425)
+        self.assertEqual([c.success for c in commands], [True] * 5)
+
+    def test_undo(self):
+        ba = BankAccount()
+        first = BankAccountCommand(ba, Action.DEPOSIT, 100)
+        second = BankAccountCommand(ba, Action.DEPOSIT, 50)
+        batch, = CommandBatcher().batch([first, second])
+        with redirect_stdout(io.StringIO()):
+            batch.invoke()
+            second.undo()
+            self.assertEqual(ba.balance, 100)
+            first.undo()
+            self.assertEqual(ba.balance, 0)
+
+            batch.invoke()
+            batch.undo()
+            self.assertEqual(ba.balance, 0)
+            first.undo()
+            self.assertEqual(ba.balance, 0)
+
+            batch.invoke()
+            first.undo()
+            batch.undo()
+            batch.undo()
+        self.assertEqual(ba.balance, 0)
+
+    def test_undo_under_overdraft_limit(self):
+        ba = BankAccount()
+        first = BankAccountCommand(ba, Action.DEPOSIT, 100)
+        second = BankAccountCommand(ba, Action.DEPOSIT, 100)
+        batch, = CommandBatcher().batch([first, second])
+        with redirect_stdout(io.StringIO()):
+            batch.invoke()
+            ba.withdraw(600)
+            batch.undo()
+        # Same as undoing the two deposits one by one
+        self.assertEqual(ba.balance, -500)
+        self.assertEqual([first.success, second.success], [True, False])
+        self.assertTrue(batch.success)
+
+
+if __name__ == '__main__':
+    import random
+    rnd = random.Random(0)
+    accounts = [BankAccount() for _ in range(100)]
+    commands = []
+    for _ in range(200_000):
+        action = Action.DEPOSIT if rnd.random() < 0.9 else Action.WITHDRAW
+        commands.append(BankAccountCommand(rnd.choice(accounts), action, rnd.randint(1, 100)))
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for cmd in commands:
+            cmd.invoke()
+        raw_time = time.perf_counter() - start
+        for cmd in reversed(commands):
+            cmd.undo()
+
+        batcher = CommandBatcher()
+        start = time.perf_counter()
+        for cmd in batcher.batch(commands):
+            cmd.invoke()
+        batched_time = time.perf_counter() - start
+
+    print(f"reduction ratio: {batcher.reduction_ratio:.1f}x")
+    print(f"raw: {raw_time * 1000:.1f} msec, batched (incl. batching): "
+          f"{batched_time * 1000:.1f} msec")
+
+    unittest.main()
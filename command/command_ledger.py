@@ -0,0 +1,172 @@
+from array import array
+from contextlib import redirect_stdout
+import io
+import time
+import unittest
+
+from command1 import (Action, BankAccount, BankAccountCommand,
+                      MoneyTransferCommans)
+
+
+class Op:
+    """Column codes for the kind of a ledger operation"""
+    DEPOSIT = 0
+    WITHDRAW = 1
+    TRANSFER = 2
+
+
+class ColumnarLedger:
+    """
+    Balances of many accounts kept in one typed array indexed by account id.
+
+    A batch of commands is stored as parallel columns (kind, source,
+    target, amount) instead of one Python object per command, and apply()
+    runs them in a single loop over those columns. This is not a bulk or
+    vectorized operation: every command is still one loop iteration, the
+    gain over the object path comes from skipping the per-command objects,
+    method calls and prints. The loop has to run in order anyway, because
+    OVERDRAFT_LIMIT makes the result of a withdrawal depend on every
+    earlier operation on the same account.
+    """
+
+    def __init__(self, balances=()):
+        self.balances = array('q', balances)
+
+    def open_account(self, balance=0):
+        """Add a new account and return its id."""
+        self.balances.append(balance)
+        return len(self.balances) - 1
+
+    def __len__(self):
+        return len(self.balances)
+
+    def __getitem__(self, account_id):
+        return self.balances[account_id]
+
+    def apply(self, kinds, sources, targets, amounts):
+        """
+        Apply a batch of operations given as columns.
+        Returns an array of per-operation success flags (1 or 0), equal to
+        what invoking the same commands one by one would produce.
+        """
+        balances = self.balances
+        limit = BankAccount.OVERDRAFT_LIMIT
+        success = array('b', bytes(len(kinds)))
+        deposit = Op.DEPOSIT
+        transfer = Op.TRANSFER
+
+        for i, (kind, source, target, amount) in enumerate(
+                zip(kinds, sources, targets, amounts)):
+            if kind == deposit:
+                balances[target] += amount
+            elif balances[source] - amount < limit:
+                continue
+            else:
+                balances[source] -= amount
+                if kind == transfer:
+                    balances[target] += amount
+            success[i] = 1
+        return success
+
+    def apply_commands(self, commands, account_ids):
+        """
+        Apply BankAccountCommand / MoneyTransferCommans objects.
+        `account_ids` maps each BankAccount to its id in this ledger.
+        """
+        kinds, sources, targets, amounts = to_columns(commands, account_ids)
+        return self.apply(kinds, sources, targets, amounts)
+
+
+def to_columns(commands, account_ids):
+    """Convert command objects into (kind, source, target, amount) columns."""
+    kinds = array('b')
+    sources = array('q')
+    targets = array('q')
+    amounts = array('q')
+    for cmd in commands:
+        if isinstance(cmd, MoneyTransferCommans):
+            withdraw_cmd, deposit_cmd = cmd.commands
+            kinds.append(Op.TRANSFER)
+            sources.append(account_ids[withdraw_cmd.account])
+            targets.append(account_ids[deposit_cmd.account])
+            amounts.append(withdraw_cmd.amount)
+        elif isinstance(cmd, BankAccountCommand):
+            account_id = account_ids[cmd.account]
+            if cmd.action == Action.DEPOSIT:
+                kinds.append(Op.DEPOSIT)
+                sources.append(-1)
+                targets.append(account_id)
+            else:
+                kinds.append(Op.WITHDRAW)
+                sources.append(account_id)
+                targets.append(-1)
+            amounts.append(cmd.amount)
+        else:
+            raise TypeError(f"Unsupported command {type(cmd).__name__}")
+    return kinds, sources, targets, amounts
+
+
+def _random_commands(accounts, count, seed=0):
+    import random
+    rnd = random.Random(seed)
+    commands = []
+    for _ in range(count):
+        choice = rnd.random()
+        a, b = rnd.sample(accounts, 2)
+        amount = rnd.randint(1, 400)
+        if choice < 0.4:
+            commands.append(BankAccountCommand(a, Action.DEPOSIT, amount))
+        elif choice < 0.7:
+            commands.append(BankAccountCommand(a, Action.WITHDRAW, amount))
+        else:
+            commands.append(MoneyTransferCommans(a, b, amount))
+    return commands
+
+
+class TestSuite(unittest.TestCase):
+
+    def test_matches_object_path(self):
+        accounts = [BankAccount(100 * i) for i in range(20)]
+        account_ids = {acc: i for i, acc in enumerate(accounts)}
+        ledger = ColumnarLedger(acc.balance for acc in accounts)
+        commands = _random_commands(accounts, 2000)
+
+        flags = ledger.apply_commands(commands, account_ids)
+
+        with redirect_stdout(io.StringIO()):
+            for cmd in commands:
+                cmd.invoke()
+        self.assertEqual(list(flags), [int(c.success) for c in commands])
+        self.assertEqual(list(ledger.balances),
+                         [acc.balance for acc in accounts])
+
+    def test_overdraft_rejected_in_order(self):
+        ledger = ColumnarLedger([0, 0])
+        flags = ledger.apply(array('b', [Op.WITHDRAW, Op.WITHDRAW, Op.DEPOSIT]),
+                             array('q', [0, 0, -1]),
+                             array('q', [-1, -1, 1]),
+                             array('q', [400, 200, 50]))
+        self.assertEqual(list(flags), [1, 0, 1])
+        self.assertEqual(list(ledger.balances), [-400, 50])
+
+
+if __name__ == '__main__':
+    accounts = [BankAccount(1000) for _ in range(1000)]
+    account_ids = {acc: i for i, acc in enumerate(accounts)}
+    commands = _random_commands(accounts, 200_000)
+
+    ledger = ColumnarLedger(acc.balance for acc in accounts)
+    columns = to_columns(commands, account_ids)
+    start = time.perf_counter()
+    ledger.apply(*columns)
+    print(f"ledger: {len(commands)} commands in "
+          f"{(time.perf_counter() - start) * 1000:.1f} msec")
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for cmd in commands:
+            cmd.invoke()
+    print(f"objects: {len(commands)} commands in "
+          f"{(time.perf_counter() - start) * 1000:.1f} msec")
+
+    unittest.main()
@@ -0,0 +1,342 @@
+from contextlib import redirect_stdout
+import io
+import multiprocessing as mp
+import os
+import pickle
+import sys
+import time
+import unittest
+
+from command1 import (Action, BankAccount, BankAccountCommand,
+                      MoneyTransferCommans)
+
+
+# Messages sent to a shard worker
+BATCH = 'batch'        # (BATCH, pickled commands)     -> (reserved, credited, flags)
+RESOLVE = 'resolve'    # (RESOLVE, (reserved, credited)) -> (reserved, credited, flags)
+BALANCES = 'balances'  # (BALANCES, None)              -> {account_id: balance}
+STOP = 'stop'
+
+
+class _Shard:
+    """
+    The accounts of one shard and its progress through the current batch.
+
+    Every shard walks the whole batch in order and runs the commands that
+    touch its accounts, so the commands of a shard keep the batch order.
+    A cross-shard transfer is split in two phases: the source shard
+    reserves the money (a WITHDRAW), the target shard credits it once the
+    reservation is known to have succeeded, and the source shard then
+    commits the reservation or rolls it back through its undo().
+
+    Until those outcomes arrive the money is "in flight": it may still be
+    added to an account (a credit, a rolled back reservation) or not. A
+    withdrawal whose result depends on it can't run yet, so the shard stops
+    there and continues when the coordinator delivers more outcomes.
+    """
+
+    def __init__(self, shard, workers, balances):
+        self.shard = shard
+        self.workers = workers
+        self.accounts = {acc_id: BankAccount(balance) for acc_id, balance in balances.items()}
+        self.start_batch([])
+
+    def start_batch(self, ops):
+        self.ops = ops
+        self.position = 0
+        self.flags = bytearray(len(ops))
+        self.in_flight = {}   # account_id -> money that may still come back or arrive
+        self.reserved = {}    # index -> (WITHDRAW command, source id) of a reservation
+        self.waiting = {}     # index -> (target id, amount, source shard) of a credit
+        self.outcomes = {}    # index -> reservation result, for credits not reached yet
+        self.sent_reserved = {}
+        self.sent_credited = {}
+
+    def _can_withdraw(self, account_id, amount):
+        """True or False once certain, None while in-flight money decides it."""
+        account = self.accounts.get(account_id)
+        if account is None:
+            return False
+        limit = BankAccount.OVERDRAFT_LIMIT
+        if account.balance - amount >= limit:
+            return True
+        if account.balance + self.in_flight.get(account_id, 0) - amount >= limit:
+            return None
+        return False
+
+    def _add_in_flight(self, account_id, amount):
+        self.in_flight[account_id] = self.in_flight.get(account_id, 0) + amount
+
+    def _send(self, outbox, shard, index, value):
+        outbox.setdefault(shard, {})[index] = value
+
+    def _credit(self, index, ok):
+        dst, amount, src_shard = self.waiting.pop(index)
+        account = self.accounts.get(dst)
+        if account is not None:
+            self.in_flight[dst] -= amount
+        if ok:
+            if account is not None:
+                BankAccountCommand(account, Action.DEPOSIT, amount).invoke()
+            self._send(self.sent_credited, src_shard, index, account is not None)
+
+    def _resolve(self, index, committed):
+        cmd, src = self.reserved.pop(index)
+        self.in_flight[src] -= cmd.amount
+        if committed:
+            self.flags[index] = 1
+        else:
+            cmd.undo()
+
+    def run(self, reserved=None, credited=None):
+        """
+        Apply outcomes sent by other shards, then run the batch as far as
+        possible. Returns (reservations, credits, flags): reservation and
+        credit results by the shard that waits for them, and the success
+        flags once nothing of this shard's part of the batch is left.
+        """
+        self.sent_reserved, self.sent_credited = {}, {}
+        for index, ok in (reserved or {}).items():
+            if index in self.waiting:
+                self._credit(index, ok)
+            else:
+                self.outcomes[index] = ok
+        for index, committed in (credited or {}).items():
+            self._resolve(index, committed)
+
+        ops, shard, workers = self.ops, self.shard, self.workers
+        accounts, flags = self.accounts, self.flags
+        while self.position < len(ops):
+            index = self.position
+            op = ops[index]
+            if op[0] == 'transfer':
+                _, src, dst, amount = op
+                src_shard, dst_shard = src % workers, dst % workers
+                if src_shard == shard:
+                    ok = self._can_withdraw(src, amount)
+                    if ok is None:
+                        break
+                    if dst_shard != shard:
+                        # Phase 1: reserve the money on the source account
+                        if ok:
+                            cmd = BankAccountCommand(accounts[src], Action.WITHDRAW, amount)
+                            cmd.invoke()
+                            self.reserved[index] = (cmd, src)
+                            self._add_in_flight(src, amount)
+                        self._send(self.sent_reserved, dst_shard, index, ok)
+                    elif ok and dst in accounts:
+                        cmd = MoneyTransferCommans(accounts[src], accounts[dst], amount)
+                        cmd.invoke()
+                        flags[index] = cmd.success
+                elif dst_shard == shard:
+                    # Phase 2: credit the target once the reservation is known
+                    self.waiting[index] = (dst, amount, src_shard)
+                    if dst in accounts:
+                        self._add_in_flight(dst, amount)
+                    if index in self.outcomes:
+                        self._credit(index, self.outcomes.pop(index))
+            else:
+                action, acc_id, amount = op
+                if acc_id % workers == shard:
+                    if action == Action.WITHDRAW:
+                        ok = self._can_withdraw(acc_id, amount)
+                        if ok is None:
+                            break
+                    else:
+                        ok = acc_id in accounts
+                    if ok:
+                        cmd = BankAccountCommand(accounts[acc_id], action, amount)
+                        cmd.invoke()
+                        flags[index] = cmd.success
+            self.position += 1
+
+        done = self.position == len(ops) and not self.reserved and not self.waiting
+        return self.sent_reserved, self.sent_credited, bytes(flags) if done else None
+
+
+def _shard_worker(conn, shard, workers, balances):
+    """Runs one _Shard in a worker process, driven by messages on `conn`."""
+    # BankAccount prints on every operation, keep worker output quiet
+    sys.stdout = open(os.devnull, 'w')
+    state = _Shard(shard, workers, balances)
+
+    while True:
+        kind, payload = conn.recv()
+        if kind == STOP:
+            break
+        if kind == BATCH:
+            state.start_batch(pickle.loads(payload))
+            conn.send(state.run())
+        elif kind == RESOLVE:
+            conn.send(state.run(*payload))
+        elif kind == BALANCES:
+            conn.send({acc_id: acc.balance for acc_id, acc in state.accounts.items()})
+
+
+class ShardedLedger:
+    """
+    Accounts partitioned by id across worker processes (id % workers).
+
+    Commands are plain tuples so they can cross process boundaries:
+        (Action.DEPOSIT, account_id, amount)
+        (Action.WITHDRAW, account_id, amount)
+        ('transfer', from_id, to_id, amount)
+
+    execute() gives the same flags and balances as invoking the commands
+    one by one with command1. The batch is pickled once and sent whole to
+    every shard, which picks out its own commands, so the coordinator does
+    no per-command work; it only forwards the outcomes of cross-shard
+    transfers between shards until every shard has finished.
+    """
+
+    def __init__(self, balances, workers=2):
+        self.workers = workers
+        self._conns = []
+        self._processes = []
+        for shard in range(workers):
+            parent, child = mp.Pipe()
+            shard_balances = {acc_id: balance for acc_id, balance in enumerate(balances)
+                              if acc_id % workers == shard}
+            process = mp.Process(target=_shard_worker,
+                                 args=(child, shard, workers, shard_balances), daemon=True)
+            process.start()
+            self._conns.append(parent)
+            self._processes.append(process)
+
+    def shard_of(self, account_id):
+        return account_id % self.workers
+
+    def _broadcast(self, kind, per_shard):
+        """Send one message to every shard that has work and collect replies."""
+        busy = [shard for shard, payload in enumerate(per_shard) if payload]
+        for shard in busy:
+            self._conns[shard].send((kind, per_shard[shard]))
+        return {shard: self._conns[shard].recv() for shard in busy}
+
+    def execute(self, commands):
+        """Run a batch of commands, return their success flags in order."""
+        commands = list(commands)
+        batch = pickle.dumps(commands, pickle.HIGHEST_PROTOCOL)
+        replies = self._broadcast(BATCH, [batch] * self.workers)
+        success = 0
+        finished = 0
+
+        while True:
+            deliveries = [None] * self.workers
+            for shard, (reserved, credited, flags) in replies.items():
+                if flags is not None:
+                    success |= int.from_bytes(flags, 'little')
+                    finished += 1
+                for kind, outbox in enumerate((reserved, credited)):
+                    for target, outcomes in outbox.items():
+                        if deliveries[target] is None:
+                            deliveries[target] = ({}, {})
+                        deliveries[target][kind].update(outcomes)
+            if not any(deliveries):
+                break
+            replies = self._broadcast(RESOLVE, deliveries)
+
+        if finished != self.workers:
+            raise RuntimeError("shards stopped waiting for each other")
+        return list(map(bool, success.to_bytes(len(commands), 'little')))
+
+    def balances(self):
+        result = {}
+        for shard_balances in self._broadcast(BALANCES, [True] * self.workers).values():
+            result.update(shard_balances)
+        return [result[acc_id] for acc_id in sorted(result)]
+
+    def close(self):
+        for conn in self._conns:
+            conn.send((STOP, None))
+        for process in self._processes:
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _random_ops(accounts, count, seed=0):
+    import random
+    rnd = random.Random(seed)
+    ops = []
+    for _ in range(count):
+        a, b = rnd.sample(range(accounts), 2)
+        amount = rnd.randint(1, 300)
+        choice = rnd.random()
+        if choice < 0.4:
+            ops.append((Action.DEPOSIT, a, amount))
+        elif choice < 0.6:
+            ops.append((Action.WITHDRAW, a, amount))
+        else:
+            ops.append(('transfer', a, b, amount))
+    return ops
+
+
+class TestSuite(unittest.TestCase):
+
+    def test_money_is_conserved(self):
+        ops = [op for op in _random_ops(10, 500) if op[0] == 'transfer']
+        with ShardedLedger([100] * 10, workers=3) as ledger:
+            ledger.execute(ops)
+            self.assertEqual(sum(ledger.balances()), 1000)
+
+    def test_failed_credit_rolls_back(self):
+        with ShardedLedger([100, 0], workers=2) as ledger:
+            # account 3 does not exist on shard 1, the reservation is undone
+            flags = ledger.execute([('transfer', 0, 3, 50), ('transfer', 0, 1, 50)])
+            self.assertEqual(flags, [False, True])
+            self.assertEqual(ledger.balances(), [50, 50])
+
+    def test_cross_shard_overdraft(self):
+        with ShardedLedger([100, 0], workers=2) as ledger:
+            flags = ledger.execute([('transfer', 0, 1, 1000)])
+            self.assertEqual(flags, [False])
+            self.assertEqual(ledger.balances(), [100, 0])
+
+    def test_shard_keeps_batch_order(self):
+        with ShardedLedger([100, 0], workers=2) as ledger:
+            # The withdrawal only fails once the transfer has taken the money
+            flags = ledger.execute([('transfer', 0, 1, 100), (Action.WITHDRAW, 0, 550)])
+            self.assertEqual(flags, [True, False])
+            self.assertEqual(ledger.balances(), [0, 100])
+
+    def test_matches_sequential_commands(self):
+        # Low balances, so many withdrawals depend on money in flight
+        ops = _random_ops(12, 3000, seed=1)
+        accounts = [BankAccount(100) for _ in range(12)]
+        expected = []
+        with redirect_stdout(io.StringIO()):
+            for op in ops:
+                if op[0] == 'transfer':
+                    cmd = MoneyTransferCommans(accounts[op[1]], accounts[op[2]], op[3])
+                else:
+                    cmd = BankAccountCommand(accounts[op[1]], op[0], op[2])
+                cmd.invoke()
+                expected.append(cmd.success)
+        for workers in (1, 3):
+            with ShardedLedger([100] * 12, workers=workers) as ledger:
+                self.assertEqual(ledger.execute(ops), expected)
+                self.assertEqual(ledger.balances(), [acc.balance for acc in accounts])
+
+
+if __name__ == '__main__':
+    accounts = 10_000
+    ops = _random_ops(accounts, 200_000)
+    batches = [ops[i:i + 20_000] for i in range(0, len(ops), 20_000)]
+    # Shards run in parallel, so scaling needs at least as many free cores
+    print(f"{os.cpu_count()} CPU(s)")
+    for workers in (1, 2, 4):
+        with ShardedLedger([1000] * accounts, workers=workers) as ledger:
+            start = time.perf_counter()
+            coordinator = time.process_time()
+            for batch in batches:
+                ledger.execute(batch)
+            coordinator = time.process_time() - coordinator
+            elapsed = time.perf_counter() - start
+        print(f"{workers} worker(s): {len(ops) / elapsed:,.0f} commands/sec, "
+              f"coordinator busy {coordinator / elapsed:.0%} of the time")
+
+    unittest.main()
@@ -16,6 +16,69 @@ This pattern is useful for:
 - Implementing hierarchical structures where operations should work on both leaves and branches
 """
 
+from collections import Counter
+
+
+class SubtreeStats:
+    """
+    Aggregated totals of a subtree (the node itself included).
+    
+    Attributes:
+        count (int): Number of objects in the subtree
+        by_color (Counter): Number of objects per color (None = no color)
+        by_type (Counter): Number of objects per name ('Circle', 'Group'...)
+    
+    Instances are cached by GraphicObject and shared, treat them as read-only.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.by_color = Counter()
+        self.by_type = Counter()
+    
+    def __repr__(self):
+        return (f"SubtreeStats(count={self.count}, by_color={dict(self.by_color)}, "
+                f"by_type={dict(self.by_type)})")
+
+
+class ChildCollection:
+    """
+    Ordered container of child objects with O(1) add, remove and membership.
+    
+    Backed by a dict used as an ordered set (dicts keep insertion order),
+    so removing one of thousands of siblings does not scan a list.
+    Supports iteration, reversed(), len() and `in` like the list it replaces.
+    """
+    
+    def __init__(self):
+        self._items = {}
+    
+    def add(self, child):
+        self._items[child] = None
+    
+    def discard(self, child):
+        """Remove child if present. Returns True if it was removed."""
+        return self._items.pop(child, self) is not self
+    
+    def __contains__(self, child):
+        return child in self._items
+    
+    def __iter__(self):
+        return iter(self._items)
+    
+    def __reversed__(self):
+        return reversed(self._items)
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __getitem__(self, index):
+        """Positional access, O(n) - kept for convenience, not for hot paths."""
+        return list(self._items)[index]
+    
+    def __repr__(self):
+        return f"ChildCollection({list(self._items)!r})"
+
 
 class GraphicObject:
     """
@@ -35,9 +98,13 @@ class GraphicObject:
         Args:
             color (str, optional): Color of the object. None means no specific color.
         """
+        # Ordered collection of child objects - this makes it a composite
+        self.children = ChildCollection()
+        # Back-reference to the composite that contains this object
+        self.parent = None
+        # Cached SubtreeStats, None means "dirty, recompute on next query"
+        self._stats = None
         self.color = color
-        # List to store child objects - this makes it a composite
-        self.children = []  
         # Default name for composite objects
         self._name = 'Group'
     
@@ -49,57 +116,180 @@ class GraphicObject:
         """
         return self._name
     
+    @property
+    def color(self):
+        return self._color
+    
+    @color.setter
+    def color(self, value):
+        self._color = value
+        self._invalidate()
+    
+    def _invalidate(self):
+        """
+        Mark this node and its ancestors dirty.
+        
+        Stops at the first node that is already dirty: a dirty node always
+        has dirty ancestors, so there is nothing left to do above it.
+        """
+        node = self
+        while node is not None and node._stats is not None:
+            node._stats = None
+            node = node.parent
+    
     def add_child(self, child):
         """
         Add a child object to this composite.
         This method makes the composite nature more explicit.
+        
+        If the child already belongs to another composite it is moved
+        (reparented), an object never has two parents.
+        
+        Raises:
+            ValueError: If child is this object or one of its ancestors,
+                which would turn the tree into a cycle.
         """
-        self.children.append(child)
+        # An object without children can't be one of our ancestors, so the
+        # walk up (O(depth)) only happens when a whole subtree is attached
+        node = self if child.children else None
+        if child is self:
+            node = child
+        while node is not None:
+            if node is child:
+                raise ValueError(f"Can't add {child.name} to its own subtree")
+            node = node.parent
+        if child.parent is not None:
+            child.parent.children.discard(child)
+            child.parent._invalidate()
+        self.children.add(child)
+        child.parent = self
+        self._invalidate()
     
     def remove_child(self, child):
         """
         Remove a child object from this composite.
         """
-        if child in self.children:
-            self.children.remove(child)
+        if self.children.discard(child):
+            child.parent = None
+            self._invalidate()
+    
+    def add_children(self, children):
+        """Add several children at once, keeping their order."""
+        for child in children:
+            self.add_child(child)
     
-    def _build_string_representation(self, depth=0):
+    def remove_children(self, children):
+        """Remove several children at once, ignoring ones that are not ours."""
+        for child in children:
+            self.remove_child(child)
+    
+    def walk_preorder(self):
         """
-        Recursively build the string representation of the object tree.
+        Iterate over (depth, node) pairs, each parent before its children.
         
-        Args:
-            depth (int): Current depth in the tree (used for indentation)
-            
-        Returns:
-            str: String representation of this object and its children
+        Uses an explicit stack instead of recursion, so the depth of the
+        tree is not limited by the interpreter's recursion limit.
         """
-        # Create indentation based on depth in the tree
-        indent = '*' * depth
+        stack = [(0, self)]
+        while stack:
+            depth, node = stack.pop()
+            yield depth, node
+            # Push children reversed so they come out in their original order
+            for child in reversed(node.children):
+                stack.append((depth + 1, child))
+    
+    def walk_postorder(self):
+        """
+        Iterate over (depth, node) pairs, each parent after all its children.
         
-        # Build the current object's representation
-        color_part = self.color if self.color else ""
-        current_line = f"{indent}{color_part} {self.name}\n"
+        Useful for operations that need results from the children first,
+        e.g. computing totals of a subtree.
+        """
+        stack = [(0, self, False)]
+        while stack:
+            depth, node, children_done = stack.pop()
+            if children_done:
+                yield depth, node
+                continue
+            stack.append((depth, node, True))
+            for child in reversed(node.children):
+                stack.append((depth + 1, child, False))
+    
+    @property
+    def stats(self):
+        """
+        SubtreeStats of this object and everything below it.
         
-        # Recursively get representations of all children
-        children_lines = []
-        for child in self.children:
-            child_repr = child._build_string_representation(depth + 1)
-            children_lines.append(child_repr)
+        Cached per node: after the first query, asking again on an unchanged
+        tree is O(1). After a change only the dirty path from the changed
+        node up to the root is recomputed, clean children reuse their cache.
+        """
+        if self._stats is None:
+            # Childless objects with the same color and name have identical
+            # stats, share one instance per pair (flyweight)
+            leaf_stats = {}
+            stack = [(self, False)]
+            while stack:
+                node, children_done = stack.pop()
+                if not children_done:
+                    stack.append((node, True))
+                    for child in node.children:
+                        if child._stats is None:
+                            stack.append((child, False))
+                    continue
+                if not node.children:
+                    key = (node.color, node.name)
+                    stats = leaf_stats.get(key)
+                    if stats is None:
+                        stats = leaf_stats[key] = SubtreeStats()
+                        stats.count = 1
+                        stats.by_color[node.color] += 1
+                        stats.by_type[node.name] += 1
+                    node._stats = stats
+                    continue
+                stats = SubtreeStats()
+                stats.count = 1
+                stats.by_color[node.color] += 1
+                stats.by_type[node.name] += 1
+                by_color, by_type = stats.by_color, stats.by_type
+                for child in node.children:
+                    child_stats = child._stats
+                    stats.count += child_stats.count
+                    for key, value in child_stats.by_color.items():
+                        by_color[key] += value
+                    for key, value in child_stats.by_type.items():
+                        by_type[key] += value
+                node._stats = stats
+        return self._stats
+    
+    def iter_lines(self):
+        """
+        Lazily generate the lines of the string representation.
         
-        # Combine current object with all its children
-        return current_line + ''.join(children_lines)
+        Each line is "<indent><color> <name>" where the indentation is one
+        '*' per level of depth in the tree.
+        """
+        for depth, node in self.walk_preorder():
+            color_part = node.color if node.color else ""
+            yield f"{'*' * depth}{color_part} {node.name}"
+    
+    def write_to(self, writer):
+        """
+        Stream the representation to any object with a write() method
+        (a file, sys.stdout, io.StringIO...) without building one big string.
+        """
+        for line in self.iter_lines():
+            writer.write(line)
+            writer.write('\n')
     
     def __str__(self):
         """
         String representation of the entire object tree.
         
-        This method is much cleaner now - it simply delegates to the 
-        _build_string_representation method without managing complex state.
-        
         Returns:
             str: Complete string representation of the object hierarchy
         """
-        return self._build_string_representation().rstrip('\n')  # Remove trailing newline
+        return '\n'.join(self.iter_lines())
 
 
 class Circle(GraphicObject):
@@ -146,8 +336,7 @@ if __name__ == "__main__":
     
     # Create a nested group (composite within composite)
     group = GraphicObject()  # This will have default name 'Group'
-    group.add_child(Circle('Blue'))
-    group.add_child(Square('Blue'))
+    group.add_children([Circle('Blue'), Square('Blue')])
     
     # Add the group to the main drawing
     # This demonstrates the key benefit: treating individual objects and 
@@ -160,9 +349,11 @@ if __name__ == "__main__":
     print("Complete drawing structure:")
     print(drawing)
     
+    print("\nShapes per color:", dict(drawing.stats.by_color))
+    
     print("\n" + "="*50)
     print("Pattern Benefits Demonstrated:")
     print("1. Uniform treatment: Squares and Groups added the same way")
     print("2. Tree structure: Nested groups within drawings")  
-    print("3. Recursive operations: __str__ works on entire tree")
+    print("3. Tree-wide operations: __str__ works on entire tree")
     print("4. Transparency: Client doesn't need to distinguish leaf vs composite")
\ No newline at end of file
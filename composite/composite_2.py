@@ -2,51 +2,330 @@
 # This allows treating individual neurons and layers of neurons uniformly.
 
 from abc import ABC
-from collections.abc import Iterable
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Sequence
+
+
+# Connectivity of one network of neurons.
+# Connections are appended in bulk to two flat id arrays (source, target),
+# and every neuron has a typed array of its output ids and one of its input
+# ids. connect() extends those rows with C-level array operations, so
+# reading a neuron's connections never needs a rebuild.
+#
+# A store holds the neurons it numbers, so it lives exactly as long as some
+# neuron of its network is referenced. connect_to merges the stores of two
+# networks (see merge).
+class ConnectionStore:
+    def __init__(self):
+        # Neuron objects by id; None for ids owned by a CompactNeuronLayer
+        self.neurons = []
+        self._block_starts = []
+        self._block_owners = []
+        self._sources = array('l')
+        self._targets = array('l')
+        # Per neuron id: array of connected ids, None while there are none
+        self._outgoing = []
+        self._incoming = []
+        # Store that took over this one's neurons, see absorb()
+        self.absorbed_into = None
+
+    def add_neuron(self, neuron):
+        self.neurons.append(neuron)
+        self._outgoing.append(None)
+        self._incoming.append(None)
+        return len(self.neurons) - 1
+
+    # Reserves `count` consecutive ids for a layer that creates its neuron
+    # objects on demand, returns the first id.
+    def add_block(self, owner, count):
+        first = len(self.neurons)
+        self.neurons.extend([None] * count)
+        self._outgoing.extend([None] * count)
+        self._incoming.extend([None] * count)
+        self._block_starts.append(first)
+        self._block_owners.append(owner)
+        return first
+
+    # Neuron object for an id, built on demand for compact layers.
+    def neuron(self, neuron_id):
+        neuron = self.neurons[neuron_id]
+        if neuron is None:
+            block = bisect_right(self._block_starts, neuron_id) - 1
+            neuron = self._block_owners[block][neuron_id - self._block_starts[block]]
+        return neuron
+
+    @property
+    def edge_count(self):
+        return len(self._sources)
+
+    # (sources, targets) of the connections added after the first `start` ones,
+    # so incremental consumers only copy the new part of the edge list.
+    def edges_since(self, start):
+        return self._sources[start:], self._targets[start:]
+
+    # Connects every source id to every target id with a handful of C-level
+    # array operations instead of one Python append per pair.
+    def connect(self, source_ids, target_ids):
+        if not source_ids or not target_ids:
+            return
+        sources = array('l', source_ids)
+        targets = array('l', target_ids)
+        for s in sources:
+            self._sources.extend(array('l', [s]) * len(targets))
+            self._targets.extend(targets)
+            self._extend_row(self._outgoing, s, targets)
+        for t in targets:
+            self._extend_row(self._incoming, t, sources)
+
+    @staticmethod
+    def _extend_row(rows, neuron_id, ids):
+        row = rows[neuron_id]
+        if row is None:
+            rows[neuron_id] = array('l', ids)
+            return
+        try:
+            row.extend(ids)
+        except BufferError:
+            # A memoryview of the row is still in use, it keeps the old copy
+            rows[neuron_id] = row + ids
+
+    # Ids connected to `neuron_id`, as a zero-copy memoryview of its row.
+    def neighbour_ids(self, neuron_id, outgoing=True):
+        row = (self._outgoing if outgoing else self._incoming)[neuron_id]
+        if row is None:
+            return memoryview(array('l'))
+        return memoryview(row)
+
+    # Moves every neuron and connection of `other` into this store. The moved
+    # neurons are renumbered after the ones already here; `other` is left empty
+    # and points to this store (absorbed_into).
+    def absorb(self, other):
+        offset = len(self.neurons)
+        for neuron in other.neurons:
+            if neuron is not None:
+                neuron.id += offset
+                neuron.store = self
+        for start, owner in zip(other._block_starts, other._block_owners):
+            owner.first_id = start + offset
+            owner.store = self
+            self._block_starts.append(start + offset)
+            self._block_owners.append(owner)
+        self.neurons.extend(other.neurons)
+
+        def shift(ids):
+            return array('l', [i + offset for i in ids])
+
+        self._sources.extend(shift(other._sources))
+        self._targets.extend(shift(other._targets))
+        for rows, other_rows in ((self._outgoing, other._outgoing),
+                                 (self._incoming, other._incoming)):
+            rows.extend(None if row is None else shift(row) for row in other_rows)
+        other.__init__()
+        other.absorbed_into = self
+
+    # The store now holding this store's neurons: itself, or the end of the
+    # absorbed_into chain.
+    def current(self):
+        store = self
+        while store.absorbed_into is not None:
+            store = store.absorbed_into
+        return store
+
+    # Store holding all neurons of `stores`: the largest one absorbs the others,
+    # so the fewest neurons are renumbered.
+    @staticmethod
+    def merge(stores):
+        stores = sorted(stores, key=lambda s: len(s.neurons) + s.edge_count, reverse=True)
+        for other in stores[1:]:
+            stores[0].absorb(other)
+        return stores[0]
+
+
+# Read-only sequence of the neurons connected to one neuron.
+# It is a view: it always reflects the current state of the store.
+class ConnectionView(Sequence):
+    def __init__(self, store, neuron_id, outgoing):
+        self.store = store
+        self.neuron_id = neuron_id
+        self.outgoing = outgoing
+
+    @property
+    def ids(self):
+        return self.store.neighbour_ids(self.neuron_id, self.outgoing)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.neuron(i) for i in self.ids[index]]
+        return self.store.neuron(self.ids[index])
+
+    def __iter__(self):
+        neuron = self.store.neuron
+        return (neuron(i) for i in self.ids)
+
 
 # Abstract base class for connectable objects, implementing Iterable for uniform iteration.
 class Connectable(Iterable, ABC):
+    __slots__ = ()  # so that subclasses can use __slots__ too
+
+    # Ids of all neurons in this object, in iteration order.
+    def neuron_ids(self):
+        return [n.id for n in self]
+
+    # Stores holding the neurons of this object (normally just one).
+    def stores(self):
+        return {n.store for n in self}
+
     # Connects this object to another, establishing inputs and outputs between all pairs.
+    # Objects of different networks are merged into one store first.
     def connect_to(self, other):
         if self == other:
             return
-        
-        for s in self:
-            for o in other:
-                s.outputs.append(0)
-                o.inputs.append(s)
-    
+
+        store = ConnectionStore.merge(self.stores() | other.stores())
+        store.connect(self.neuron_ids(), other.neuron_ids())
+
 
 # Represents a single neuron with inputs and outputs.
 class Neuron(Connectable):
-    def __init__(self, name):
+    # Without a store the neuron starts a network of its own.
+    def __init__(self, name, store=None):
         self.name = name
-        self.inputs = []
-        self.outputs = []
-        
+        self.store = store if store is not None else ConnectionStore()
+        self.id = self.store.add_neuron(self)
+
+    @property
+    def inputs(self):
+        return ConnectionView(self.store, self.id, outgoing=False)
+
+    @property
+    def outputs(self):
+        return ConnectionView(self.store, self.id, outgoing=True)
+
     def __str__(self):
         return f"{self.name}, "\
             f"{len(self.inputs)} inputs, " \
             f"{len(self.outputs)} outputs"
-            
+
     # Makes the neuron iterable, yielding itself for uniform handling.
     def __iter__(self):
         yield self
-            
-        
 
-        
+
+
+
 # Represents a layer of neurons, inheriting from list and Connectable.
 class NeuronLayer(list, Connectable):
-    def __init__(self, name, count):
+    # The neurons share one store, a new one unless `store` is given.
+    def __init__(self, name, count, store=None):
         super().__init__()
         self.name = name
+        self._store = store if store is not None else ConnectionStore()
         for x in range(0, count):
-            self.append(Neuron(f'{name}-{x}'))
-            
+            self.append(Neuron(f'{name}-{x}', self._store))
+
+    def __str__(self):
+        return f"{self.name} with {len(self)} neurons"
+
+    @property
+    def store(self):
+        return self[0].store if self else self._store
+
+
+# One neuron of a CompactNeuronLayer. Created on demand and holds no state
+# of its own: everything is read from (and written to) the layer's arrays.
+class NeuronRef(Connectable):
+    __slots__ = ('layer', 'index')
+
+    def __init__(self, layer, index):
+        self.layer = layer
+        self.index = index
+
+    @property
+    def store(self):
+        return self.layer.store
+
+    def stores(self):
+        return {self.layer.store}
+
+    @property
+    def id(self):
+        return self.layer.first_id + self.index
+
+    @property
+    def name(self):
+        return f'{self.layer.name}-{self.index}'
+
+    @property
+    def activation(self):
+        return self.layer.activations[self.index]
+
+    @activation.setter
+    def activation(self, value):
+        self.layer.activations[self.index] = value
+
+    @property
+    def bias(self):
+        return self.layer.biases[self.index]
+
+    @bias.setter
+    def bias(self, value):
+        self.layer.biases[self.index] = value
+
+    inputs = Neuron.inputs
+    outputs = Neuron.outputs
+    __str__ = Neuron.__str__
+
+    # Compared by layer and index, not by id: ids change when connect_to
+    # merges stores, and a NeuronRef must stay findable in sets and dicts.
+    def __eq__(self, other):
+        return (isinstance(other, NeuronRef) and self.layer is other.layer
+                and self.index == other.index)
+
+    def __hash__(self):
+        return hash((id(self.layer), self.index))
+
+    def __iter__(self):
+        yield self
+
+
+# Struct-of-arrays version of NeuronLayer: the neurons are a range of ids
+# plus one typed array per attribute, so a neuron costs a few dozen bytes
+# instead of a Python object with a name string and lists.
+class CompactNeuronLayer(Connectable):
+    def __init__(self, name, count, store=None):
+        self.name = name
+        self.store = store if store is not None else ConnectionStore()
+        self.count = count
+        self.first_id = self.store.add_block(self, count)
+        self.activations = array('d', bytes(8 * count))
+        self.biases = array('d', bytes(8 * count))
+
+    def neuron_ids(self):
+        return range(self.first_id, self.first_id + self.count)
+
+    def stores(self):
+        return {self.store}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return NeuronRef(self, index)
+
+    def __iter__(self):
+        return (NeuronRef(self, i) for i in range(self.count))
+
     def __str__(self):
         return f"{self.name} with {len(self)} neurons"
-    
+
 
 # Main section to demonstrate the composite pattern.
 if __name__ == "__main__":
@@ -54,12 +333,20 @@ if __name__ == "__main__":
     neuron2 = Neuron("n2")
     layer1 = NeuronLayer('L1', 3)
     layer2 = NeuronLayer('L2', 4)
-    
+
     neuron1.connect_to(neuron2)
     neuron1.connect_to(layer1)
     layer1.connect_to(neuron2)
-    
+
     print(neuron1)
     print(neuron2)
     print(layer1)
-    print(layer2)
\ No newline at end of file
+    print(layer2)
+    print([n.name for n in neuron1.outputs])
+
+    # Compact layers connect exactly like the list based ones
+    layer3 = CompactNeuronLayer('L3', 5)
+    layer2.connect_to(layer3)
+    neuron2.connect_to(layer3)
+    print(layer3)
+    print(layer3[0])
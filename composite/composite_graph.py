@@ -0,0 +1,147 @@
+# Reachability and connectivity queries over a neuron graph built with
+# Connectable.connect_to. Sets of neurons are Python ints used as bitsets
+# (bit i = neuron id i), so a union or intersection of thousands of neurons
+# is a single big-int operation working on whole machine words at a time.
+
+import time
+
+from composite_2 import ConnectionStore, NeuronLayer
+
+
+# Ids of the set bits of `bits`, lowest first.
+def iter_bits(bits):
+    text = bin(bits)[:1:-1]  # least significant bit first, without '0b'
+    i = text.find('1')
+    while i != -1:
+        yield i
+        i = text.find('1', i + 1)
+
+
+class NeuronGraphAnalysis:
+    # network: a ConnectionStore, or any Connectable of the network to analyse.
+    # The analysis follows the store incrementally: refresh() (called by every
+    # query) only processes connections added since the previous call. When
+    # connect_to merges the network into another store, neuron ids change
+    # and the analysis follows it there (for a ConnectionStore through
+    # absorbed_into) and starts over; ids have to be read again from the
+    # neurons.
+    def __init__(self, network):
+        self.network = network
+        self._reset(self.store)
+
+    @property
+    def store(self):
+        if isinstance(self.network, ConnectionStore):
+            return self.network.current()
+        return self.network.store
+
+    def _reset(self, store):
+        self._store = store
+        self._seen_edges = 0
+        self.reach = []       # reach[i]: neurons reachable from i (transitive)
+        self.reached_by = []  # reached_by[i]: neurons that can reach i
+        self._parent = []     # union-find over undirected connectivity
+        self._members = []    # bitset of each union-find root's component
+
+    def _grow(self):
+        for i in range(len(self.reach), len(self.store.neurons)):
+            self.reach.append(0)
+            self.reached_by.append(0)
+            self._parent.append(i)
+            self._members.append(1 << i)
+
+    def _find(self, i):
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def refresh(self):
+        if self.store is not self._store:
+            self._reset(self.store)
+        self._grow()
+        sources, targets = self.store.edges_since(self._seen_edges)
+        self._seen_edges += len(sources)
+        reach, reached_by = self.reach, self.reached_by
+
+        # Group the new connections by source: connect_to adds every source
+        # to a whole layer, so one closure update per source is enough.
+        new_targets = {}
+        for u, v in zip(sources, targets):
+            # Connected components
+            ru, rv = self._find(u), self._find(v)
+            if ru != rv:
+                self._parent[rv] = ru
+                self._members[ru] |= self._members[rv]
+                self._members[rv] = 0
+            new_targets[u] = new_targets.get(u, 0) | (1 << v)
+
+        # Transitive closure: everything reaching u now reaches everything
+        # reachable from u's new targets
+        for u, target_bits in new_targets.items():
+            target_bits &= ~reach[u]
+            if not target_bits:
+                continue
+            after = target_bits
+            for v in iter_bits(target_bits):
+                after |= reach[v]
+            before = reached_by[u] | (1 << u)
+            for x in iter_bits(before):
+                reach[x] |= after
+            for y in iter_bits(after):
+                reached_by[y] |= before
+
+    def can_reach(self, source, target):
+        self.refresh()
+        return bool(self.reach[source] >> target & 1)
+
+    # Neuron ids from which `neuron_id` can be reached.
+    def reaching(self, neuron_id):
+        self.refresh()
+        return list(iter_bits(self.reached_by[neuron_id]))
+
+    # Neuron ids reachable from `neuron_id`.
+    def reachable_from(self, neuron_id):
+        self.refresh()
+        return list(iter_bits(self.reach[neuron_id]))
+
+    # Weakly connected components (direction ignored), as lists of ids.
+    def components(self):
+        self.refresh()
+        return [list(iter_bits(bits)) for bits in self._members if bits]
+
+    # Neurons lying on a cycle: the ones that can reach themselves.
+    def cyclic_neurons(self):
+        self.refresh()
+        return [i for i, bits in enumerate(self.reach) if bits >> i & 1]
+
+    def has_cycle(self):
+        return bool(self.cyclic_neurons())
+
+
+# Main section: questions about a small network.
+if __name__ == "__main__":
+    store = ConnectionStore()
+    layer1 = NeuronLayer('L1', 300, store)
+    layer2 = NeuronLayer('L2', 300, store)
+    layer3 = NeuronLayer('L3', 300, store)
+    island = NeuronLayer('island', 2, store)
+
+    analysis = NeuronGraphAnalysis(store)
+    start = time.perf_counter()
+    layer1.connect_to(layer2)
+    layer2.connect_to(layer3)
+    analysis.refresh()
+    print(f"{store.edge_count} connections analysed in "
+          f"{(time.perf_counter() - start) * 1000:.0f} msec")
+
+    print("L1-0 reaches L3-5:", analysis.can_reach(layer1[0].id, layer3[5].id))
+    print("neurons reaching L3-5:", len(analysis.reaching(layer3[5].id)))
+    print("components:", [len(c) for c in analysis.components()])
+    print("has cycle:", analysis.has_cycle())
+
+    # Incremental update: one new connection closes a loop
+    layer3[0].connect_to(layer1[0])
+    print("has cycle after L3-0 -> L1-0:", analysis.has_cycle(),
+          f"({len(analysis.cyclic_neurons())} neurons on cycles)")
@@ -0,0 +1,258 @@
+"""
+Compact binary format for GraphicObject trees.
+
+Instead of pickling a deep graph of objects, the tree is flattened into
+a pre-order array of fixed size records:
+
+    type id (uint16) | color id (uint32) | child count (uint32)
+
+Type ids point into a table of (class name, group name) pairs and color ids
+into a table of interned color strings, so every node takes 10 bytes
+no matter how long its color or name is.
+
+File layout (little endian):
+
+    b'GOB1'
+    uint32 number of types,  then per type:  uint16 len + class name,
+                                              uint16 len + name
+    uint32 number of colors, then per color: uint16 len + utf-8 color
+    uint32 number of nodes,  then the node records
+
+Both saving and loading are single pass and iterative, so the depth of
+the tree is not limited by the recursion limit.
+"""
+
+import mmap
+import struct
+
+from composite import Circle, GraphicObject, Square
+
+
+MAGIC = b'GOB1'
+NODE = struct.Struct('<HII')
+COUNT = struct.Struct('<I')
+LENGTH = struct.Struct('<H')
+# Color id used for objects without a color
+NO_COLOR = 0xFFFFFFFF
+
+# Classes that can be restored, by class name
+DEFAULT_TYPES = {cls.__name__: cls for cls in (GraphicObject, Circle, Square)}
+
+
+def _write_string(out, text):
+    data = text.encode('utf-8')
+    out.append(LENGTH.pack(len(data)))
+    out.append(data)
+
+
+def _read_string(data, offset):
+    length, = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    return str(data[offset:offset + length], 'utf-8'), offset + length
+
+
+def dumps(root):
+    """Serialize a GraphicObject tree into bytes."""
+    type_ids = {}
+    color_ids = {}
+    records = bytearray()
+    pack = NODE.pack
+
+    for _, node in root.walk_preorder():
+        type_key = (type(node).__name__, node._name)
+        type_id = type_ids.get(type_key)
+        if type_id is None:
+            type_id = type_ids[type_key] = len(type_ids)
+
+        if node.color is None:
+            color_id = NO_COLOR
+        else:
+            color_id = color_ids.get(node.color)
+            if color_id is None:
+                color_id = color_ids[node.color] = len(color_ids)
+
+        records += pack(type_id, color_id, len(node.children))
+
+    out = [MAGIC, COUNT.pack(len(type_ids))]
+    for class_name, name in type_ids:
+        _write_string(out, class_name)
+        _write_string(out, name)
+    out.append(COUNT.pack(len(color_ids)))
+    for color in color_ids:
+        _write_string(out, color)
+    out.append(COUNT.pack(len(records) // NODE.size))
+    out.append(records)
+    return b''.join(out)
+
+
+def _read_header(data):
+    """Return (types, colors, node count, offset of the first record)."""
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a GraphicObject tree file")
+    offset = len(MAGIC)
+
+    type_count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    types = []
+    for _ in range(type_count):
+        class_name, offset = _read_string(data, offset)
+        name, offset = _read_string(data, offset)
+        types.append((class_name, name))
+
+    color_count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    colors = []
+    for _ in range(color_count):
+        color, offset = _read_string(data, offset)
+        colors.append(color)
+
+    node_count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    return types, colors, node_count, offset
+
+
+def loads(data, types=None):
+    """
+    Rebuild a GraphicObject tree from bytes produced by dumps().
+
+    Args:
+        types (dict, optional): class name -> class, for GraphicObject
+            subclasses other than the ones defined in composite.py
+    """
+    registry = dict(DEFAULT_TYPES)
+    if types:
+        registry.update(types)
+
+    type_table, colors, node_count, offset = _read_header(data)
+    try:
+        classes = [(registry[class_name], name) for class_name, name in type_table]
+    except KeyError as e:
+        raise ValueError(f"Unknown GraphicObject type {e.args[0]!r}") from None
+
+    records = NODE.iter_unpack(memoryview(data)[offset:offset + node_count * NODE.size])
+    root = None
+    # Stack of [parent, children still to read]
+    stack = []
+    for type_id, color_id, child_count in records:
+        cls, name = classes[type_id]
+        node = cls(None if color_id == NO_COLOR else colors[color_id])
+        node._name = name
+
+        if stack:
+            top = stack[-1]
+            # node is brand new, it can't close a cycle or have another
+            # parent, so skip add_child's checks
+            top[0].children.add(node)
+            node.parent = top[0]
+            top[1] -= 1
+            if not top[1]:
+                stack.pop()
+        else:
+            root = node
+
+        if child_count:
+            stack.append([node, child_count])
+    return root
+
+
+def save(root, path):
+    with open(path, 'wb') as f:
+        f.write(dumps(root))
+
+
+def load(path, types=None):
+    with open(path, 'rb') as f:
+        return loads(f.read(), types)
+
+
+class GraphicTreeView:
+    """
+    Read-only, lazily loaded view of a saved tree.
+
+    The file is memory-mapped and no GraphicObject is created: records are
+    decoded only when asked for, so inspecting a huge drawing costs almost
+    no memory.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.types, self.colors, self._count, self._offset = _read_header(self._mmap)
+
+    def __len__(self):
+        return self._count
+
+    def _decode(self, type_id, color_id, child_count):
+        color = None if color_id == NO_COLOR else self.colors[color_id]
+        class_name, name = self.types[type_id]
+        return class_name, name, color, child_count
+
+    def record(self, index):
+        """(class name, name, color, child count) of the index-th node in pre-order."""
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._decode(*NODE.unpack_from(self._mmap, self._offset + index * NODE.size))
+
+    def __iter__(self):
+        # Record by record straight from the mapping: slicing the mmap would
+        # copy the whole record region, and a memoryview held by a paused
+        # iterator would keep close() from unmapping the file
+        unpack_from = NODE.unpack_from
+        data = self._mmap
+        decode = self._decode
+        end = self._offset + self._count * NODE.size
+        for offset in range(self._offset, end, NODE.size):
+            yield decode(*unpack_from(data, offset))
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import os
+    import pickle
+    import sys
+    import tempfile
+    import time
+
+    node_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+
+    drawing = GraphicObject()
+    drawing._name = 'My drawing'
+    colors = ['Red', 'Green', 'Blue', 'Yellow']
+    group = None
+    for i in range(node_count - 1):
+        if i % 1000 == 0:
+            group = GraphicObject()
+            drawing.add_child(group)
+            continue
+        shape = Circle if i % 2 else Square
+        group.add_child(shape(colors[i % len(colors)]))
+
+    def measure(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f"{label:<14} {(time.perf_counter() - start) * 1000:8.1f} msec")
+        return result
+
+    print(f"Tree of {node_count} nodes")
+    data = measure("binary dump", lambda: dumps(drawing))
+    pickled = measure("pickle dump", lambda: pickle.dumps(drawing))
+    print(f"binary size    {len(data):>8} bytes")
+    print(f"pickle size    {len(pickled):>8} bytes")
+    restored = measure("binary load", lambda: loads(data))
+    measure("pickle load", lambda: pickle.loads(pickled))
+    assert str(restored) == str(drawing)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'drawing.gob')
+        save(drawing, path)
+        with GraphicTreeView(path) as view:
+            red = measure("mmap scan", lambda: sum(1 for r in view if r[2] == 'Red'))
+            print(f"{red} red shapes, first child: {view.record(1)}")
@@ -1,14 +1,683 @@
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import json
+import sys
+import threading
 import time
+import weakref
+from collections import OrderedDict
+
 
 def time_it(func):
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func()
-        end = time.time()
-        print(f"{func.__name__} takes {int((end-start)*1000)} msec")
+        start = time.perf_counter_ns()
+        result = func(*args, **kwargs)
+        end = time.perf_counter_ns()
+        print(f"{func.__name__} takes {(end - start) // 1_000_000} msec")
+        return result
+    return wrapper
+
+
+class FunctionStats:
+    """Call count and latency histogram of one function (in one thread)."""
+
+    # Bucket i counts calls that took [2**(i-1), 2**i) nanoseconds
+    BUCKETS = 64
+
+    def __init__(self):
+        self.calls = 0
+        self.sampled = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * FunctionStats.BUCKETS
+
+    def record(self, elapsed_ns):
+        self.sampled += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.histogram[min(elapsed_ns.bit_length(), FunctionStats.BUCKETS - 1)] += 1
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.sampled += other.sampled
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        for i, count in enumerate(other.histogram):
+            self.histogram[i] += count
+
+
+class ProfileRegistry:
+    """
+    Process-wide store of FunctionStats.
+
+    Every thread writes to its own stats objects, so the hot path takes no
+    lock; snapshot() merges the per-thread data when asked.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+
+    def stats_for(self, name):
+        """FunctionStats of the calling thread for `name`."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        stats = shard.get(name)
+        if stats is None:
+            stats = shard[name] = FunctionStats()
+        return stats
+
+    def snapshot(self):
+        """Merged stats of all threads: {name: {...}}."""
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for name, stats in list(shard.items()):
+                merged.setdefault(name, FunctionStats()).merge(stats)
+
+        result = {}
+        for name, stats in merged.items():
+            result[name] = {
+                'calls': stats.calls,
+                'sampled': stats.sampled,
+                'total_ns': stats.total_ns,
+                'mean_ns': stats.total_ns // stats.sampled if stats.sampled else 0,
+                'max_ns': stats.max_ns,
+                # {upper bound in ns: count}, empty buckets left out
+                'histogram': {1 << i: count for i, count in enumerate(stats.histogram) if count},
+            }
         return result
-    return wrapper    
-    
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+registry = ProfileRegistry()
+
+
+def profile(func=None, *, name=None, sample_every=1, registry=registry):
+    """
+    Count calls and record latencies of a sync or async function.
+
+    Usable as @profile or @profile(sample_every=100). With sample_every=N
+    every call is counted but only every N-th one is timed, which keeps the
+    overhead down on very hot functions.
+    """
+    if func is None:
+        return functools.partial(profile, name=name, sample_every=sample_every,
+                                 registry=registry)
+
+    key = name or f"{func.__module__}.{func.__qualname__}"
+    clock = time.perf_counter_ns
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            stats = registry.stats_for(key)
+            stats.calls += 1
+            if stats.calls % sample_every:
+                return await func(*args, **kwargs)
+            start = clock()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                stats.record(clock() - start)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = registry.stats_for(key)
+            stats.calls += 1
+            if stats.calls % sample_every:
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(clock() - start)
+    return wrapper
+
+
+# Separates positional from keyword arguments inside a cache key
+_KWARGS_MARK = object()
+
+
+def make_key(args, kwargs):
+    """Hashable cache key from positional and keyword arguments."""
+    if not kwargs:
+        return args
+    return args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+
+
+class LRUCache:
+    """
+    Bounded mapping with least-recently-used eviction and optional TTL.
+
+    Reads take no lock: the lookup and the move to the "recent" end are
+    single OrderedDict operations, atomic under the GIL. Only inserts and
+    evictions are serialized. Hit and miss counters are kept per thread and
+    summed in stats(), like the ProfileRegistry shards.
+    """
+
+    def __init__(self, maxsize=128, ttl=None, max_bytes=None, sizeof=sys.getsizeof):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        # key -> (value, expires_at, size)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counter_shards = []
+        self.bytes = 0
+        self.evictions = 0
+
+    def _counters(self):
+        """[hits, misses] of the calling thread."""
+        shard = getattr(self._local, 'counters', None)
+        if shard is None:
+            shard = self._local.counters = [0, 0]
+            with self._lock:
+                self._counter_shards.append(shard)
+        return shard
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at is None or expires_at > time.monotonic():
+                try:
+                    self._data.move_to_end(key)
+                except KeyError:
+                    pass  # evicted by another thread meanwhile, still a valid hit
+                self._counters()[0] += 1
+                return value
+            self.invalidate(key)
+        self._counters()[1] += 1
+        return default
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while self._data and (
+                    (self.maxsize is not None and len(self._data) > self.maxsize)
+                    or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop one key. Returns True if it was cached."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return False
+            self.bytes -= entry[2]
+            return True
+
+    def invalidate_if(self, predicate):
+        """Drop every entry for which predicate(key, value) is true."""
+        with self._lock:
+            doomed = [key for key, (value, _, _) in self._data.items() if predicate(key, value)]
+            for key in doomed:
+                self.bytes -= self._data.pop(key)[2]
+        return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            hits = sum(shard[0] for shard in self._counter_shards)
+            misses = sum(shard[1] for shard in self._counter_shards)
+        return {'hits': hits, 'misses': misses, 'evictions': self.evictions,
+                'size': len(self._data), 'bytes': self.bytes}
+
+
+def memoize(func=None, *, maxsize=128, ttl=None, max_bytes=None):
+    """
+    Cache results of a pure (sync or async) function.
+
+    Usable as @memoize or @memoize(maxsize=1000, ttl=60, max_bytes=10**6).
+    max_bytes uses sys.getsizeof of each result, a shallow estimate.
+    The wrapper exposes:
+        cache_info()                       hit / miss / eviction stats
+        cache_invalidate(*args, **kwargs)  drop the entry of one call
+        cache_invalidate_if(predicate)     predicate(args, kwargs, value)
+        cache_clear()
+    """
+    if func is None:
+        return functools.partial(memoize, maxsize=maxsize, ttl=ttl, max_bytes=max_bytes)
+
+    cache = LRUCache(maxsize, ttl, max_bytes)
+    missing = object()
+
+    if inspect.iscoroutinefunction(func):
+        # Concurrent misses on the same key share one call
+        in_flight = {}
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            value = cache.get(key, missing)
+            if value is not missing:
+                return value
+            task = in_flight.get(key)
+            if task is None:
+                task = in_flight[key] = asyncio.ensure_future(func(*args, **kwargs))
+                try:
+                    # shield: a cancelled caller must not cancel the shared call
+                    value = await asyncio.shield(task)
+                finally:
+                    del in_flight[key]
+                cache.put(key, value)
+                return value
+            return await asyncio.shield(task)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            value = cache.get(key, missing)
+            if value is missing:
+                value = func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+
+    def split_key(key):
+        if _KWARGS_MARK in key:
+            i = key.index(_KWARGS_MARK)
+            return key[:i], dict(key[i + 1:])
+        return key, {}
+
+    def invalidate_if(predicate):
+        return cache.invalidate_if(lambda key, value: predicate(*split_key(key), value))
+
+    wrapper.cache = cache
+    wrapper.cache_info = cache.stats
+    wrapper.cache_clear = cache.clear
+    wrapper.cache_invalidate = lambda *args, **kwargs: cache.invalidate(make_key(args, kwargs))
+    wrapper.cache_invalidate_if = invalidate_if
+    return wrapper
+
+
+class _ThreadBatcher:
+    """
+    Collects calls from many threads into batches.
+
+    The first caller of an empty window becomes its leader: it waits up to
+    max_latency seconds (or until max_size items are queued), then takes
+    the window, runs the batch function on its own thread and hands every
+    result to its caller. A window is closed once it is taken or full, and
+    the next call opens a new one with a leader of its own.
+    """
+
+    def __init__(self, batch_func, max_size, max_latency, isolate_errors):
+        self.batch_func = batch_func
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self.isolate_errors = isolate_errors
+        self._pending = []
+        self._cond = threading.Condition()
+
+    def __call__(self, item):
+        future = concurrent.futures.Future()
+        with self._cond:
+            window = self._pending
+            window.append((item, future))
+            leader = len(window) == 1
+            if len(window) >= self.max_size:
+                self._pending = []
+                self._cond.notify_all()
+
+        if leader:
+            self._lead(window)
+        return future.result()
+
+    def _lead(self, window):
+        deadline = time.monotonic() + self.max_latency
+        with self._cond:
+            while window is self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._pending = []
+                    break
+                self._cond.wait(remaining)
+        _run_batch(self.batch_func, window, self.isolate_errors)
+
+
+class _AsyncBatcher:
+    """Collects calls from asyncio tasks of one event loop into batches."""
+
+    def __init__(self, batch_func, max_size, max_latency, isolate_errors):
+        self.batch_func = batch_func
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self.isolate_errors = isolate_errors
+        self._pending = []
+        self._timer = None
+
+    async def __call__(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(_run_async_batch(self.batch_func, batch, self.isolate_errors))
+
+
+def _deliver(batch, results):
+    if len(results) != len(batch):
+        raise ValueError(f"Batch function returned {len(results)} results for {len(batch)} items")
+    for (_, future), result in zip(batch, results):
+        if future.done():
+            continue
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+def _fail(batch, error):
+    for _, future in batch:
+        if future.done():
+            continue
+        if isinstance(error, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(error)
+
+
+def _run_batch(batch_func, batch, isolate_errors):
+    try:
+        _deliver(batch, list(batch_func([item for item, _ in batch])))
+    except Exception as e:
+        if not isolate_errors or len(batch) == 1:
+            _fail(batch, e)
+            return
+        # Retry one by one so a bad item only fails its own caller
+        for entry in batch:
+            _run_batch(batch_func, [entry], isolate_errors)
+    except BaseException as e:
+        # KeyboardInterrupt and the like: no caller may be left waiting
+        _fail(batch, e)
+        raise
+
+
+async def _run_async_batch(batch_func, batch, isolate_errors):
+    try:
+        _deliver(batch, list(await batch_func([item for item, _ in batch])))
+    except Exception as e:
+        if not isolate_errors or len(batch) == 1:
+            _fail(batch, e)
+            return
+        for entry in batch:
+            await _run_async_batch(batch_func, [entry], isolate_errors)
+    except BaseException as e:
+        _fail(batch, e)
+        raise
+
+
+def micro_batch(batch_func=None, *, max_size=64, max_latency=0.002, isolate_errors=True):
+    """
+    Turn a batch function (list of items -> list of results) into a
+    single-item function that concurrent callers can share.
+
+    Calls arriving within max_latency seconds, up to max_size of them, are
+    passed to one batch_func call; each caller gets its own result back.
+    A result that is an exception instance is raised in its caller only.
+    If the whole batch raises and isolate_errors is on, the items are retried
+    one by one so only the failing ones see an error.
+
+    Works from threads for plain functions and from asyncio tasks for
+    `async def` batch functions (the single-item function is then async too).
+    """
+    if batch_func is None:
+        return functools.partial(micro_batch, max_size=max_size, max_latency=max_latency,
+                                 isolate_errors=isolate_errors)
+
+    if inspect.iscoroutinefunction(batch_func):
+        batchers = weakref.WeakKeyDictionary()  # one per event loop
+
+        @functools.wraps(batch_func)
+        async def wrapper(item):
+            loop = asyncio.get_running_loop()
+            batcher = batchers.get(loop)
+            if batcher is None:
+                batcher = batchers[loop] = _AsyncBatcher(batch_func, max_size,
+                                                         max_latency, isolate_errors)
+            return await batcher(item)
+    else:
+        batcher = _ThreadBatcher(batch_func, max_size, max_latency, isolate_errors)
+
+        @functools.wraps(batch_func)
+        def wrapper(item):
+            return batcher(item)
+
+    wrapper.batch = batch_func
+    return wrapper
+
+
+class HotPathTracer:
+    """
+    Line and call level profiler built on PEP 669 sys.monitoring (3.12+).
+
+    Only functions registered with @tracer.trace are instrumented: the
+    monitoring events are enabled on their code objects alone, and only
+    while the tracer is active (start()/stop() or `with tracer:`). The
+    decorator returns the function itself, so inactive tracing costs nothing.
+
+    Results:
+        call_stats()  {qualname: (calls, total ns)}
+        line_stats()  {(qualname, line): (hits, ns spent on the line)}
+        collapsed()   "outer;inner <self microseconds>" lines, the input
+                      format of flamegraph.pl / speedscope
+    """
+
+    # Tool ids tried when none is given: the profiler's, then the two that
+    # CPython leaves unassigned, then the ones of debuggers, coverage and
+    # optimizers. cProfile takes PROFILER_ID itself on 3.12+.
+    TOOL_ID_PREFERENCE = (2, 3, 4, 0, 1, 5)
+
+    def __init__(self, tool_id=None):
+        self.monitoring = getattr(sys, 'monitoring', None)
+        self.requested_tool_id = tool_id
+        self.tool_id = None  # the id in use while active
+        self.active = False
+        self._codes = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._lines = {}
+        self._stacks = {}
+
+    def trace(self, func):
+        code = func.__code__
+        self._codes.add(code)
+        if self.active:
+            self._enable(code)
+        return func
+
+    def _local_events(self):
+        events = self.monitoring.events
+        return (events.PY_START | events.PY_RESUME | events.PY_RETURN
+                | events.PY_YIELD | events.LINE)
+
+    def _enable(self, code):
+        self.monitoring.set_local_events(self.tool_id, code, self._local_events())
+
+    def start(self):
+        if self.monitoring is None:
+            raise RuntimeError("HotPathTracer needs sys.monitoring (Python 3.12+)")
+        if self.active:
+            return
+        monitoring, events = self.monitoring, self.monitoring.events
+        self.tool_id = self._claim_tool_id()
+        monitoring.register_callback(self.tool_id, events.PY_START, self._on_start)
+        monitoring.register_callback(self.tool_id, events.PY_RESUME, self._on_resume)
+        monitoring.register_callback(self.tool_id, events.PY_RETURN, self._on_return)
+        monitoring.register_callback(self.tool_id, events.PY_YIELD, self._on_return)
+        monitoring.register_callback(self.tool_id, events.PY_UNWIND, self._on_unwind)
+        monitoring.register_callback(self.tool_id, events.LINE, self._on_line)
+        # An exception leaving a traced function is only visible globally
+        monitoring.set_events(self.tool_id, events.PY_UNWIND)
+        for code in self._codes:
+            self._enable(code)
+        self.active = True
+
+    def stop(self):
+        if not self.active:
+            return
+        monitoring = self.monitoring
+        for code in self._codes:
+            monitoring.set_local_events(self.tool_id, code, 0)
+        monitoring.set_events(self.tool_id, 0)
+        for event in (monitoring.events.PY_START, monitoring.events.PY_RESUME,
+                      monitoring.events.PY_RETURN, monitoring.events.PY_YIELD,
+                      monitoring.events.PY_UNWIND, monitoring.events.LINE):
+            monitoring.register_callback(self.tool_id, event, None)
+        monitoring.free_tool_id(self.tool_id)
+        self.tool_id = None
+        self.active = False
+
+    def _claim_tool_id(self):
+        monitoring = self.monitoring
+        if self.requested_tool_id is not None:
+            candidates = (self.requested_tool_id,)
+        else:
+            candidates = self.TOOL_ID_PREFERENCE
+        for tool_id in candidates:
+            if monitoring.get_tool(tool_id) is not None:
+                continue
+            try:
+                monitoring.use_tool_id(tool_id, 'HotPathTracer')
+            except ValueError:
+                continue  # taken meanwhile
+            return tool_id
+        in_use = {tool_id: monitoring.get_tool(tool_id) for tool_id in candidates}
+        raise RuntimeError(f"No free sys.monitoring tool id for HotPathTracer, in use: {in_use}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Per thread stack of frames: [code, start ns, children ns, line, line start ns]
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    # A generator or coroutine runs in several pieces: PY_START begins the
+    # call, each PY_YIELD pauses it and each PY_RESUME carries it on. Every
+    # piece is timed, only PY_START counts as a call.
+    def _on_start(self, code, offset):
+        self._on_resume(code, offset)
+        with self._lock:
+            calls, total = self._calls.get(code.co_qualname, (0, 0))
+            self._calls[code.co_qualname] = (calls + 1, total)
+
+    def _on_resume(self, code, offset):
+        now = time.perf_counter_ns()
+        self._stack().append([code, now, 0, None, now])
+
+    def _on_line(self, code, line):
+        now = time.perf_counter_ns()
+        stack = self._stack()
+        if not stack or stack[-1][0] is not code:
+            return
+        frame = stack[-1]
+        self._add_line(frame, now)
+        frame[3] = line
+        frame[4] = now
+
+    def _add_line(self, frame, now):
+        if frame[3] is None:
+            return
+        key = (frame[0].co_qualname, frame[3])
+        with self._lock:
+            hits, spent = self._lines.get(key, (0, 0))
+            self._lines[key] = (hits + 1, spent + now - frame[4])
+
+    def _on_return(self, code, offset, retval):
+        now = time.perf_counter_ns()
+        stack = self._stack()
+        if not stack or stack[-1][0] is not code:
+            return
+        path = ';'.join(frame[0].co_qualname for frame in stack)
+        frame = stack.pop()
+        self._add_line(frame, now)
+        elapsed = now - frame[1]
+        if stack:
+            stack[-1][2] += elapsed
+        with self._lock:
+            calls, total = self._calls.get(code.co_qualname, (0, 0))
+            self._calls[code.co_qualname] = (calls, total + elapsed)
+            self._stacks[path] = self._stacks.get(path, 0) + elapsed - frame[2]
+
+    def _on_unwind(self, code, offset, exception):
+        if code in self._codes:
+            self._on_return(code, offset, None)
+
+    def call_stats(self):
+        with self._lock:
+            return dict(self._calls)
+
+    def line_stats(self):
+        with self._lock:
+            return dict(self._lines)
+
+    def collapsed(self):
+        with self._lock:
+            stacks = dict(self._stacks)
+        return '\n'.join(f"{path} {ns // 1000}" for path, ns in sorted(stacks.items()))
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._lines.clear()
+            self._stacks.clear()
+
+
+tracer = HotPathTracer()
+
+
 @time_it
 def some_op():
     print('starting..')
@@ -16,4 +685,63 @@ def some_op():
     print('we are done')
     return
 
-some_op()
\ No newline at end of file
+
+if __name__ == '__main__':
+    some_op()
+
+    @profile
+    def add(a, b):
+        return a + b
+
+    @profile(sample_every=100)
+    def hot(x):
+        return x * 2
+
+    @profile
+    async def fetch(delay):
+        await asyncio.sleep(delay)
+        return delay
+
+    for i in range(10_000):
+        add(i, i)
+        hot(i)
+    asyncio.run(fetch(0.01))
+    print(registry.to_json(indent=2))
+
+    @memoize(maxsize=2)
+    def square(x):
+        return x * x
+
+    for x in (1, 2, 1, 3, 1, 2):
+        square(x)
+    square.cache_invalidate_if(lambda args, kwargs, value: value > 1)
+    print(square.cache_info())
+
+    batch_sizes = []
+
+    @micro_batch(max_size=16, max_latency=0.01)
+    def lookup(keys):
+        batch_sizes.append(len(keys))
+        return [key.upper() for key in keys]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=32) as pool:
+        names = list(pool.map(lookup, ['a', 'b', 'c'] * 20))
+    print(f"{len(names)} lookups done in {len(batch_sizes)} batches")
+
+    if hasattr(sys, 'monitoring'):
+        @tracer.trace
+        def inner(n):
+            total = 0
+            for i in range(n):
+                total += i
+            return total
+
+        @tracer.trace
+        def outer():
+            return [inner(1000) for _ in range(100)]
+
+        outer()  # not traced: the tracer is not active yet
+        with tracer:
+            outer()
+        print(tracer.call_stats())
+        print(tracer.collapsed())
@@ -1,6 +1,13 @@
 from abc import ABC
 
 class Shape(ABC):
+    # Bumped on every attribute change, lets wrappers notice a modified shape
+    _version = 0
+
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        object.__setattr__(self, '_version', self._version + 1)
+
     def __str__(self):
         return ''
     
@@ -41,11 +48,76 @@ class TransparentShape(Shape):
     def __str__(self):
         return f"{self.shape} has {self.transparency*100} % transparency"
 
-circle = Circle(2)
-print(circle)
 
-red_circle = ColoredShape(circle, 'red')
-print(red_circle)
+class FlattenedShape(Shape):
+    """
+    A whole chain of ColoredShape/TransparentShape decorators collapsed into
+    one wrapper around the base shape.
+
+    The chain is walked once, without recursion. Attribute access goes
+    straight to the base shape, and the string is cached until the base
+    shape changes, so the cost no longer grows with the number of layers.
+    """
+    def __init__(self, shape):
+        layers = []
+        while isinstance(shape, (ColoredShape, TransparentShape)):
+            layers.append(shape)
+            shape = shape.shape
+        layers.reverse()  # innermost decorator first
+
+        self.shape = shape
+        # Merged attributes: the outermost decorator wins
+        self.color = None
+        self.transparency = None
+        suffixes = []
+        for layer in layers:
+            if isinstance(layer, ColoredShape):
+                self.color = layer.color
+                suffixes.append(f" has the color {layer.color}")
+            else:
+                self.transparency = layer.transparency
+                suffixes.append(f" has {layer.transparency*100} % transparency")
+        self.suffix = ''.join(suffixes)
+        self.depth = len(layers)
+        self._cache = None
+
+    def __getattr__(self, item):
+        # Only called for attributes FlattenedShape itself doesn't have.
+        # copy/pickle look up attributes before __init__ has set shape.
+        try:
+            shape = self.__dict__['shape']
+        except KeyError:
+            raise AttributeError(item) from None
+        return getattr(shape, item)
+
+    def __str__(self):
+        version = self.shape._version
+        if self._cache is None or self._cache[0] != version:
+            self._cache = (version, f"{self.shape}{self.suffix}")
+        return self._cache[1]
+
+
+def flatten(shape):
+    """Collapse a decorator chain into a FlattenedShape."""
+    return FlattenedShape(shape)
+
+
+if __name__ == '__main__':
+    circle = Circle(2)
+    print(circle)
+
+    red_circle = ColoredShape(circle, 'red')
+    print(red_circle)
+
+    red_half_tranpsarent_circle = TransparentShape(red_circle, 0.5)
+    print(red_half_tranpsarent_circle)
 
-red_half_tranpsarent_circle = TransparentShape(red_circle, 0.5)
-print(red_half_tranpsarent_circle)
\ No newline at end of file
+    # Hundreds of layers: the nested version recurses through every one of
+    # them on each str(), the flattened one builds the string once
+    deep = circle
+    for i in range(500):
+        deep = ColoredShape(deep, 'red') if i % 2 else TransparentShape(deep, 0.5)
+    flat = flatten(deep)
+    print(flat.color, flat.transparency, flat.depth, len(str(flat)))
+    flat.resize(2)  # forwarded to the base circle, invalidates the cache
+    print(str(flat)[:30])
@@ -1,31 +1,308 @@
+import mmap
+import os
+import threading
+import time
+from array import array
+
+
 class FileWithLogging:
     def __init__(self, file):
         self.file = file
-        
+
     def writelines(self, strings):
         self.file.writelines(strings)
         print(f"Wrote {len(strings)} lines")
-        
+
     def __iter__(self):
-        return self.file__iter__()
-        
+        return self.file.__iter__()
+
     def __next__(self):
         return self.file.__next__()
-        
+
     def __getattr__(self, item):
         return getattr(self.__dict__['file'], item)
-    
+
     def __setattr__(self, key, value):
         if key == 'file':
             self.__dict__[key] = value
         else:
-            setattr(self.__dict__['file'], key)
-            
+            setattr(self.__dict__['file'], key, value)
+
     def __delattr__(self, item):
         delattr(self.__dict__['file'], item)
-        
 
-file = FileWithLogging(open('hello.txt', "w"))
-file.writelines(['hello', 'world'])
-file.write('testing')
-file.close()
\ No newline at end of file
+
+class BufferedFileWithLogging(FileWithLogging):
+    """
+    FileWithLogging that coalesces writes into large chunks.
+
+    Instead of printing on every call, it counts writes, lines and bytes
+    (characters for text files) in stats(). Buffered data is written to the
+    file when about flush_size of it is pending, when flush_interval seconds
+    have passed since the last flush, and on flush()/close(). With
+    background=True a writer thread does the time based flushes, so a quiet
+    producer doesn't keep data in memory.
+
+    write() only appends to a list (atomic, no lock). Sizes and lines are
+    counted when the data is flushed, and the size limit is checked as a
+    number of pending writes, estimated from the average write size of the
+    previous flush.
+    """
+    def __init__(self, file, flush_size=1 << 20, flush_interval=None, background=False):
+        super().__init__(file)
+        if background and flush_interval is None:
+            raise ValueError("background flushing needs a flush_interval")
+        # Own state goes straight to __dict__, __setattr__ forwards to the file
+        self.__dict__.update(
+            flush_size=flush_size,
+            flush_interval=flush_interval,
+            _chunks=[],
+            # Pending writes that make about flush_size, updated on flush
+            _flush_count=max(1, flush_size // 64),
+            _last_flush=time.monotonic(),
+            _lock=threading.Lock(),
+            _closed=threading.Event(),
+            _stats={'writes': 0, 'lines': 0, 'bytes': 0, 'flushes': 0},
+            _writer=None,
+        )
+        # Time based flushes are checked on write unless a thread does them
+        self.__dict__['_check_time'] = flush_interval is not None and not background
+        self.__dict__['write'] = self._make_write()
+        if background:
+            writer = threading.Thread(target=self._background_flush, daemon=True)
+            self.__dict__['_writer'] = writer
+            writer.start()
+
+    def _make_write(self):
+        # write() is a closure stored on the instance: FileWithLogging's
+        # __getattr__ makes every attribute lookup on self slow, and the hot
+        # path would otherwise do four of them per call
+        state = self.__dict__
+        chunks = state['_chunks']
+        check_time = state['_check_time']
+        interval = self.flush_interval
+        monotonic = time.monotonic
+        flush = self.flush
+
+        def write(data):
+            chunks.append(data)
+            if len(chunks) >= state['_flush_count'] or (
+                    check_time and monotonic() - state['_last_flush'] >= interval):
+                flush()
+            return len(data)
+        return write
+
+    def writelines(self, strings):
+        strings = list(strings)
+        if strings:
+            self.write(strings[0][:0].join(strings))
+
+    def flush(self):
+        with self._lock:
+            chunks = self._chunks
+            # Only take what is there now, writers may keep appending
+            count = len(chunks)
+            taken = chunks[:count]
+            del chunks[:count]
+            self.__dict__['_last_flush'] = time.monotonic()
+            if taken:
+                data = taken[0][:0].join(taken)
+                self.file.write(data)
+                stats = self._stats
+                stats['writes'] += count
+                stats['lines'] += data.count('\n' if isinstance(data, str) else b'\n')
+                stats['bytes'] += len(data)
+                stats['flushes'] += 1
+                if data:
+                    self.__dict__['_flush_count'] = max(1, self.flush_size * count // len(data))
+            self.file.flush()
+
+    def _background_flush(self):
+        while not self._closed.wait(self.flush_interval):
+            if self._chunks:
+                self.flush()
+
+    def close(self):
+        self._closed.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        self.file.close()
+
+    def stats(self):
+        """Counters of the flushed data, plus what is still buffered."""
+        with self._lock:
+            pending = sum(map(len, self._chunks[:]))
+            return dict(self._stats, pending=pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IndexedFileWithLogging(FileWithLogging):
+    """
+    Read mode for random access to lines of (very) large files.
+
+    The file is memory-mapped and the start offset of every line is kept
+    in a typed array. The index is saved next to the file (<name>.lineidx)
+    and, when the file grows, only the new part is scanned. line(n) and
+    lines(n, m) return memoryview slices of the mapping, nothing is copied.
+    Release those views before refresh() or close().
+
+    `file` must be opened in binary read mode. Meant for append-only files
+    such as logs: a file rewritten in place needs its index deleted.
+    """
+    INDEX_SUFFIX = '.lineidx'
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.__dict__.update(
+            index_path=file.name + self.INDEX_SUFFIX,
+            _map=None,
+            # offsets[0] is the number of bytes already indexed,
+            # offsets[1:] the start offset of every line
+            _offsets=array('Q', [0, 0]),
+        )
+        self._load_index()
+        self.refresh()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                offsets = array('Q')
+                offsets.frombytes(f.read())
+        except OSError:
+            return
+        size = os.fstat(self.file.fileno()).st_size
+        # An index of a file that got shorter (rewritten) can't be trusted
+        if len(offsets) >= 2 and offsets[0] <= size:
+            self.__dict__['_offsets'] = offsets
+
+    def refresh(self):
+        """Map the current file size and index lines added since last time."""
+        size = os.fstat(self.file.fileno()).st_size
+        offsets = self._offsets
+        if size and (self._map is None or len(self._map) != size):
+            old = self._map
+            self.__dict__['_map'] = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if old is not None:
+                try:
+                    old.close()
+                except BufferError:
+                    pass  # views still exported, closed when they are released
+
+        if self._map is not None:
+            # The file may have grown since fstat; index what is mapped
+            size = len(self._map)
+        start = offsets[0]
+        if start >= size:
+            return
+        data = self._map
+        known = len(offsets)
+        position = data.find(b'\n', start, size)
+        while position != -1:
+            offsets.append(position + 1)
+            position = data.find(b'\n', position + 1, size)
+        offsets[0] = size
+        self._save_index(known)
+
+    def _save_index(self, known):
+        """Write offsets added after the first `known` ones to the index file."""
+        offsets = self._offsets
+        try:
+            with open(self.index_path, 'r+b' if known > 2 else 'wb') as f:
+                f.write(offsets[:1].tobytes())
+                if known > 2:
+                    f.seek(known * offsets.itemsize)
+                    f.write(offsets[known:].tobytes())
+                else:
+                    f.write(offsets[1:].tobytes())
+        except OSError:
+            pass  # e.g. read-only directory: keep the index in memory only
+
+    def __len__(self):
+        """Number of lines (a last line without newline counts too)."""
+        offsets = self._offsets
+        count = len(offsets) - 1
+        if offsets[-1] == offsets[0]:
+            count -= 1  # the newest "line" starts at end of file
+        return count
+
+    def lines(self, start, stop):
+        """Lines [start, stop) as one memoryview, newlines included."""
+        count = len(self)
+        start, stop, _ = slice(start, stop).indices(count)
+        if start >= stop:
+            return memoryview(b'')
+        offsets = self._offsets
+        end = offsets[stop + 1] if stop < count else offsets[0]
+        return memoryview(self._map)[offsets[start + 1]:end]
+
+    def line(self, number):
+        """Line `number` (0 based) as a memoryview, newline included."""
+        count = len(self)
+        if number < 0:
+            number += count
+        if not 0 <= number < count:
+            raise IndexError(number)
+        return self.lines(number, number + 1)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    file = FileWithLogging(open('hello.txt', "w"))
+    file.writelines(['hello', 'world'])
+    file.write('testing')
+    file.close()
+
+    # Benchmark: many small writes straight to open() vs the buffered wrapper
+    line = 'x' * 60 + '\n'
+    count = 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.txt')
+
+        start = time.perf_counter()
+        with open(path, 'w') as f:
+            for _ in range(count):
+                f.write(line)
+        plain = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(path, 'w') as raw:
+            logged = FileWithLogging(raw)
+            for _ in range(count):
+                logged.write(line)
+        wrapped = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with BufferedFileWithLogging(open(path, 'w'), flush_interval=0.1,
+                                     background=True) as f:
+            for _ in range(count):
+                f.write(line)
+        buffered = time.perf_counter() - start
+
+        print(f"open(): {plain * 1000:.0f} msec")
+        print(f"FileWithLogging: {wrapped * 1000:.0f} msec")
+        print(f"BufferedFileWithLogging: {buffered * 1000:.0f} msec, {f.stats()}")
+
+        # Random access: index once, then any line without reading the rest
+        start = time.perf_counter()
+        with IndexedFileWithLogging(open(path, 'rb')) as f:
+            indexed = time.perf_counter() - start
+            print(f"indexed {len(f)} lines in {indexed * 1000:.0f} msec, "
+                  f"line 123456: {bytes(f.line(123456))!r}")
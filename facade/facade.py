@@ -2,30 +2,433 @@
 # This module demonstrates the Facade design pattern by providing a simplified interface
 # to a complex subsystem consisting of Buffer, Viewport, and Console classes.
 
+import asyncio
+import mmap
+import os
+import re
+import sys
+import time
+from array import array
+
+
+# Native byte order UTF-32: one 4-byte code unit per character, no BOM
+UTF32 = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+
+
 class Buffer:
-    """Represents a text buffer with fixed dimensions."""
+    """
+    Represents a text buffer with fixed dimensions.
+
+    Text is stored in a gap buffer: a bytearray with a free "gap" kept at
+    the last edit position, so typing at the cursor is O(1) amortized and
+    reading any character is O(1). Like CPython's own str, the storage is
+    one byte per character (latin-1) while the text fits, and is widened
+    once to four bytes per character (UTF-32) when other text is written.
+    """
     def __init__(self, width=30, height=20):
         # Initialize buffer dimensions
         self.width = width
         self.height = height
-        # Create buffer as list of spaces with total capacity width*height
-        self.buffer = [' '] * (width*height)
-        
+        # Storage starts as width*height spaces followed by an empty gap
+        self._data = bytearray(b' ' * (width*height))
+        # Bytes per character and their encoding, see _widen()
+        self._unit = 1
+        self.encoding = 'latin-1'
+        # Whether all text written so far is ASCII, see search()
+        self._ascii = True
+        # Gap bounds, in characters like every other position
+        self._gap_start = self._gap_end = width*height
+        # Position where write() inserts text, at the end by default
+        self.cursor = width*height
+        # Change log for incremental redraws: version of the last change
+        # and recent (version, start, stop) ranges of changed text
+        self.version = 0
+        self._changes = []
+        # Optional n-gram search index, see enable_index()
+        self._ngram_size = None
+        self._ngrams = None
+
+    def __len__(self):
+        return len(self._data) // self._unit - (self._gap_end - self._gap_start)
+
+    def _move_gap(self, position):
+        """Move the gap so it starts at `position` (a text offset)."""
+        data, start, end, unit = self._data, self._gap_start, self._gap_end, self._unit
+        if position < start:
+            # Shift text [position, start) to the end of the gap
+            size = start - position
+            data[(end - size) * unit:end * unit] = data[position * unit:start * unit]
+            self._gap_start, self._gap_end = position, end - size
+        elif position > start:
+            # Shift text after the gap back to the front of it
+            size = position - start
+            data[start * unit:(start + size) * unit] = data[end * unit:(end + size) * unit]
+            self._gap_start, self._gap_end = position, end + size
+
+    def _reserve(self, size):
+        """Make the gap at least `size` characters long, growing geometrically."""
+        gap = self._gap_end - self._gap_start
+        if gap >= size:
+            return
+        grow = max(size - gap, len(self._data) // self._unit // 2, 64)
+        end = self._gap_end * self._unit
+        self._data[end:end] = bytes(grow * self._unit)
+        self._gap_end += grow
+
+    def _widen(self):
+        """Switch the storage from latin-1 to UTF-32, positions stay the same."""
+        self._data = bytearray(self._data.decode('latin-1').encode(UTF32))
+        self._unit = 4
+        self.encoding = UTF32
+        self._ngrams = None  # keys are encoded text, rebuilt on next use
+
+    def _encode(self, text):
+        """`text` in the storage encoding, widening the storage if needed."""
+        if self._unit == 1:
+            try:
+                data = text.encode('latin-1')
+                self._ascii = self._ascii and data.isascii()
+                return data
+            except UnicodeEncodeError:
+                self._widen()
+        return text.encode(UTF32)
+
     def __getitem__(self, item):
         """Allow indexing into the buffer."""
-        return self.buffer.__getitem__(item)
-    
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return ''.join(self[i] for i in range(start, stop, step))
+            return str(self.view(start, stop), self.encoding) if start < stop else ''
+        length = len(self)
+        if item < 0:
+            item += length
+        if not 0 <= item < length:
+            raise IndexError('buffer index out of range')
+        if item >= self._gap_start:
+            item += self._gap_end - self._gap_start
+        unit = self._unit
+        if unit == 1:
+            return chr(self._data[item])
+        return str(self._data[item * unit:(item + 1) * unit], self.encoding)
+
+    def view(self, start=0, stop=None):
+        """
+        Zero-copy memoryview of text [start, stop), encoded in
+        self.encoding. Moves the gap out of the range if needed; release
+        the view before the next write, a bytearray can't grow while views
+        are exported.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start < self._gap_start < stop:
+            self._move_gap(stop)
+        if start >= self._gap_start:
+            shift = self._gap_end - self._gap_start
+            start, stop = start + shift, stop + shift
+        return memoryview(self._data)[start * self._unit:stop * self._unit]
+
     def write(self, text):
-        """Append text to the buffer."""
-        self.buffer += text
-        
+        """Insert text at the cursor (append, unless the cursor was moved)."""
+        data = self._encode(text)
+        size = len(text)
+        appended = self.cursor == len(self)
+        self._move_gap(self.cursor)
+        self._reserve(size)
+        start = self._gap_start * self._unit
+        self._data[start:start + len(data)] = data
+        self._gap_start += size
+        self.cursor += size
+        # Inserting shifts everything after the cursor, so it all changed
+        self._mark_dirty(self.cursor - size, len(self))
+        self._update_index(self.cursor - size, appended)
+
+    # Number of changes kept for dirty_since(), older ones mean full redraw
+    MAX_CHANGES = 256
+
+    def _mark_dirty(self, start, stop):
+        self.version += 1
+        self._changes.append((self.version, start, stop))
+        if len(self._changes) > self.MAX_CHANGES:
+            del self._changes[:len(self._changes) - self.MAX_CHANGES]
+
+    def dirty_since(self, version):
+        """
+        Text range (start, stop) changed after `version`, None if nothing
+        changed, or (0, len) when the change log doesn't go back that far.
+        """
+        if version >= self.version:
+            return None
+        changes = self._changes
+        if not changes or changes[0][0] > version + 1:
+            return 0, len(self)
+        start, stop = len(self), 0
+        for changed_version, change_start, change_stop in reversed(changes):
+            if changed_version <= version:
+                break
+            start = min(start, change_start)
+            stop = max(stop, change_stop)
+        return start, stop
+
+    def _contiguous(self):
+        """
+        The text as one bytes-like object in self.encoding, moving the gap
+        out of the way. Character i is at byte i * self._unit.
+        """
+        self._move_gap(len(self))
+        return self._data
+
+    def enable_index(self, n=3):
+        """
+        Keep an index of every n-character sequence, updated on each append, so
+        repeated find_all() calls don't scan the whole buffer. An insert in
+        the middle shifts positions: the index is then rebuilt lazily.
+        """
+        self._ngram_size = n
+        self._ngrams = None
+
+    def _update_index(self, start, appended):
+        if self._ngrams is None:
+            return
+        if not appended:
+            self._ngrams = None
+            return
+        # Sequences that start in the last n-1 old bytes now end in new ones
+        self._index_range(max(0, start - self._ngram_size + 1), len(self))
+
+    def _index_range(self, start, stop):
+        n, ngrams, data, unit = self._ngram_size, self._ngrams, self._contiguous(), self._unit
+        for position in range(start, stop - n + 1):
+            key = bytes(data[position * unit:(position + n) * unit])
+            positions = ngrams.get(key)
+            if positions is None:
+                positions = ngrams[key] = array('Q')
+            positions.append(position)
+
+    def find_all(self, needle, start=0, stop=None):
+        """Offsets of every occurrence of `needle` (str), searched in place."""
+        if self._unit == 1:
+            try:
+                needle = needle.encode('latin-1')
+            except UnicodeEncodeError:
+                return []  # the text has no such characters
+        else:
+            needle = needle.encode(UTF32)
+        data = self._contiguous()
+        unit = self._unit
+        stop = len(self) if stop is None else min(stop, len(self))
+        if not needle:
+            return []
+        length = len(needle) // unit
+
+        if self._ngram_size is not None and length >= self._ngram_size:
+            if self._ngrams is None:
+                self._ngrams = {}
+                self._index_range(0, len(self))
+            # Verify the positions of the needle's rarest n-gram
+            n = self._ngram_size
+            shift, candidates = min(
+                ((i, self._ngrams.get(needle[i * unit:(i + n) * unit], ()))
+                 for i in range(length - n + 1)),
+                key=lambda item: len(item[1]))
+            found = []
+            for p in candidates:
+                p -= shift
+                if start <= p and p + length <= stop \
+                        and data.find(needle, p * unit, (p + length) * unit) == p * unit:
+                    found.append(p)
+            return found
+
+        found = []
+        position = data.find(needle, start * unit, stop * unit)
+        while position != -1:
+            # In UTF-32 a match has to start on a character boundary
+            if not position % unit:
+                found.append(position // unit)
+            position = data.find(needle, position + 1, stop * unit)
+        return found
+
+    def _is_ascii(self):
+        """True if the text is known to be pure ASCII."""
+        return self._ascii
+
+    def search(self, pattern, start=0, stop=None):
+        """
+        (start, end) of every regular expression match, as `re` finds them
+        in the decoded text. ASCII text is searched in place, with the
+        pattern compiled as bytes; other text is decoded first. A bytes
+        pattern on latin-1 text is always searched in place, with the
+        usual bytes semantics (\\w, \\b and IGNORECASE only know ASCII).
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        if self._unit == 1:
+            if isinstance(pattern.pattern, bytes):
+                return [match.span() for match in pattern.finditer(self._contiguous(), start, stop)]
+            # Only on ASCII text and with an ASCII pattern do str and bytes
+            # rules agree (case folding, \w, ...)
+            if pattern.pattern.isascii() and self._is_ascii():
+                try:
+                    fast = re.compile(pattern.pattern.encode('ascii'),
+                                      pattern.flags & ~re.UNICODE)
+                except re.error:
+                    pass  # e.g. \u escapes, only valid in str patterns
+                else:
+                    return [match.span() for match in fast.finditer(self._contiguous(), start, stop)]
+        elif isinstance(pattern.pattern, bytes):
+            pattern = re.compile(pattern.pattern.decode('latin-1'), pattern.flags)
+        return [match.span() for match in pattern.finditer(self[0:stop], start)]
+
+
+class MappedBuffer(Buffer):
+    """
+    Buffer backed by a memory-mapped file, for documents too big for memory.
+
+    Nothing is read up front: the file is mapped on first access and the
+    OS pages in only the parts a viewport looks at. Line start offsets are
+    indexed lazily, only as far as the furthest line asked for. The file
+    is opened read-only and has to exist; the first write() reopens it for
+    appending (the cursor has to be at the end). The size is cached, call
+    refresh() to pick up data appended by other programs.
+
+    Offsets are byte offsets, so the file is read and written as latin-1
+    (one byte per character); writing other characters raises
+    UnicodeEncodeError rather than storing something else.
+    """
+    # Bytes scanned per step when extending the line index
+    INDEX_STEP = 1 << 20
+
+    def __init__(self, path, width=30, height=20):
+        self.width = width
+        self.height = height
+        self.path = path
+        self._file = open(path, 'rb')
+        self._appender = None  # opened by the first write()
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._unit = 1
+        self.encoding = 'latin-1'
+        self._ascii = True
+        self._ascii_checked = 0  # bytes checked for non-ASCII so far
+        self._map = None
+        self._mapped_size = 0
+        self._line_starts = array('Q', [0])
+        self._indexed = 0  # bytes scanned for line starts so far
+        self.version = 0
+        self._changes = []
+        # Optional n-gram search index, see enable_index()
+        self._ngram_size = None
+        self._ngrams = None
+
+    @property
+    def cursor(self):
+        return len(self)
+
+    @cursor.setter
+    def cursor(self, value):
+        if value != len(self):
+            raise ValueError("MappedBuffer only supports appending at the end")
+
+    def __len__(self):
+        return self._size
+
+    def refresh(self):
+        """Re-read the file size; text appended meanwhile is marked changed."""
+        size = os.fstat(self._file.fileno()).st_size
+        if size != self._size:
+            start, self._size = self._size, size
+            self._mark_dirty(min(start, size), size)
+            self._update_index(start, size > start)
+
+    def _mapping(self):
+        size = self._size
+        if self._map is None or self._mapped_size != size:
+            if size == 0:
+                return b''
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    pass  # a view is still exported, dropped with it
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        return self._map
+
+    def __getitem__(self, item):
+        data = self._mapping()
+        if isinstance(item, slice):
+            return data[item].decode('latin-1')
+        return chr(data[item])
+
+    def view(self, start=0, stop=None):
+        return memoryview(self._mapping())[start:stop]
+
+    def write(self, text):
+        data = text.encode('latin-1')
+        if self._appender is None:
+            self._appender = open(self.path, 'ab')
+        self._appender.write(data)
+        self._appender.flush()
+        start = self._size
+        self._size = os.fstat(self._appender.fileno()).st_size
+        self._mark_dirty(start, self._size)
+        self._update_index(start, True)
+
+    def _contiguous(self):
+        return self._mapping()
+
+    def _is_ascii(self):
+        # The file can hold anything: check what was not checked yet, once
+        data = self._mapping()
+        while self._ascii and self._ascii_checked < len(data):
+            stop = min(self._ascii_checked + self.INDEX_STEP, len(data))
+            self._ascii = data[self._ascii_checked:stop].isascii()
+            self._ascii_checked = stop
+        return self._ascii
+
+    def line_offset(self, line):
+        """Offset of the first character of `line` (0 based)."""
+        starts = self._line_starts
+        data = self._mapping()
+        while len(starts) <= line and self._indexed < len(data):
+            stop = min(self._indexed + self.INDEX_STEP, len(data))
+            position = data.find(b'\n', self._indexed, stop)
+            while position != -1:
+                starts.append(position + 1)
+                position = data.find(b'\n', position + 1, stop)
+            self._indexed = stop
+        if line >= len(starts):
+            raise IndexError(f"{self.path} has fewer than {line + 1} lines")
+        return starts[line]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._appender is not None:
+            self._appender.close()
+        self._file.close()
+
+
+# Control characters are shown as their Unicode "control picture" (a
+# newline as \u240a), so row text never moves the terminal cursor
+CONTROL_PICTURES = {code: 0x2400 + code for code in range(32)}
+CONTROL_PICTURES[0x7f] = 0x2421
+
+
 class Viewport:
     """Represents a view into a buffer with an offset."""
-    def __init__(self, buffer=None):
+    def __init__(self, buffer=None, width=None, height=None, follow=False):
         # Use provided buffer or create a new one
         self.buffer = buffer if buffer is not None else Buffer()
+        # Window size in characters, the buffer's by default
+        self.width = width or self.buffer.width
+        self.height = height or self.buffer.height
         # Starting offset for viewport
         self.offset = 0
+        # Keep the end of the buffer in view (like `tail -f`)
+        self.follow = follow
+        # What the last render() showed: (buffer version, offset) and rows
+        self._rendered = None
+        self._rows = [None] * self.height
 
     def get_char_at(self, index):
         """Get character at specified index adjusted by viewport offset."""
@@ -34,8 +437,146 @@ class Viewport:
     def append(self, text):
         """Append text to the underlying buffer."""
         self.buffer.write(text)
+
+    def scroll_to_line(self, line):
+        """Put the start of a text line at the top (buffers with line_offset)."""
+        self.offset = self.buffer.line_offset(line)
+
+    def find(self, text):
+        """
+        Viewport offsets that bring each match of `text` into view
+        (the start of the row the match is on).
+        """
+        width = self.width
+        return [position // width * width for position in self.buffer.find_all(text)]
+
+    def row_text(self, row):
+        """Text shown on `row` of the window, padded to the window width."""
+        start = self.offset + row * self.width
+        text = self.buffer[start:start + self.width]
+        return text.translate(CONTROL_PICTURES).ljust(self.width)
+
+    def changed_rows(self, seen=None):
+        """
+        Rows that may differ from what a reader saw at `seen`, and the new
+        `seen` to pass next time. `seen` is a (buffer version, offset) pair
+        and None means nothing was seen yet (every row is returned).
+
+        Only rows overlapping the text changed in the buffer since then are
+        returned, unless the window scrolled. Follow mode scrolls here.
+        """
+        buffer = self.buffer
+        if self.follow:
+            last_row_start = max(0, len(buffer) - 1) // self.width * self.width
+            self.offset = max(0, last_row_start - (self.height - 1) * self.width)
+
+        if seen is None or seen[1] != self.offset:
+            rows = range(self.height)
+        else:
+            dirty = buffer.dirty_since(seen[0])
+            if dirty is None:
+                rows = range(0)
+            else:
+                first = max(0, (dirty[0] - self.offset) // self.width)
+                last = min(self.height, (dirty[1] - self.offset) // self.width + 1)
+                rows = range(first, last)
+        return rows, (buffer.version, self.offset)
+
+    def render(self, full=False):
+        """
+        Rows that changed since the previous frame, as [(row, text)].
+
+        Only rows overlapping the text changed in the buffer are rebuilt and
+        compared with what was shown before; with full=True (or after
+        scrolling) every row of the window is returned.
+        """
+        rows, self._rendered = self.changed_rows(None if full else self._rendered)
+        changes = []
+        for row in rows:
+            text = self.row_text(row)
+            if full or text != self._rows[row]:
+                self._rows[row] = text
+                changes.append((row, text))
+        return changes
+
+    def frame(self):
+        """The whole window as one string."""
+        self.render()
+        return '\n'.join(self._rows)
+
+    @staticmethod
+    def to_ansi(changes, top=1, left=1):
+        """Turn render() output into terminal escape codes: cursor move + row."""
+        return ''.join(f"\x1b[{top + row};{left}H{text}" for row, text in changes)
+
+
         
-        
+class Compositor:
+    """
+    Composes several viewports (panes) into one screen.
+
+    The screen is a single bytearray of width*height UTF-32 characters;
+    every pane row is copied in with one slice assignment, clipped to the
+    screen. frame() returns it UTF-8 encoded, ready for the terminal.
+    Every pane remembers the buffer version and rows the compositor last
+    drew, independent of the viewport's own render(), so only changed
+    rows are copied. If panes overlap, everything is redrawn in order so
+    later panes stay on top.
+    """
+    def __init__(self, width=80, height=24):
+        self.width = width
+        self.height = height
+        self.screen = bytearray(' '.encode(UTF32) * (width * height))
+        self.panes = []  # [viewport, x, y, seen, rows drawn]
+        self._overlapping = False
+
+    def add(self, viewport, x, y):
+        for other, ox, oy, _, _ in self.panes:
+            if (x < ox + other.width and ox < x + viewport.width
+                    and y < oy + other.height and oy < y + viewport.height):
+                self._overlapping = True
+        # Nothing seen yet, so a newly added pane is drawn in full
+        self.panes.append([viewport, x, y, None, [None] * viewport.height])
+
+    def compose(self):
+        """Update the screen, returns the number of rows copied."""
+        screen, width = self.screen, self.width
+        full = self._overlapping
+        copied = 0
+        for pane in self.panes:
+            viewport, x, y, seen, drawn = pane
+            rows, pane[3] = viewport.changed_rows(None if full else seen)
+            # Horizontal clipping is the same for every row of the pane
+            left = max(0, -x)
+            right = min(viewport.width, width - x)
+            if left >= right:
+                continue
+            for row in rows:
+                screen_row = y + row
+                if not 0 <= screen_row < self.height:
+                    continue
+                text = viewport.row_text(row)
+                if not full and text == drawn[row]:
+                    continue
+                drawn[row] = text
+                start = (screen_row * width + x + left) * 4
+                screen[start:start + (right - left) * 4] = text[left:right].encode(UTF32)
+                copied += 1
+        return copied
+
+    def frame(self):
+        """Compose and return the screen as UTF-8 bytes, rows separated by newlines."""
+        self.compose()
+        text, width = str(self.screen, UTF32), self.width
+        return '\n'.join(text[i:i + width] for i in range(0, len(text), width)).encode('utf-8')
+
+    def present(self, out=None):
+        """Compose and draw the screen with a single write."""
+        out = out if out is not None else sys.stdout.buffer
+        out.write(b'\x1b[H' + self.frame())
+        out.flush()
+
+
 class Console:
     """Facade class that provides simplified interface to buffer/viewport operations."""
     def __init__(self):
@@ -55,7 +596,243 @@ class Console:
         """Get character at specified index from current viewport."""
         return self.current_viewport.get_char_at(index)
 
-# Example usage of the facade
-c = Console()  # Create console instance
-c.write('hello')  # Write text through the facade
-ch = c.get_char_at(0)  # Get character through the facade
\ No newline at end of file
+    def render(self, full=False):
+        """Changed rows of the current viewport since the last frame."""
+        return self.current_viewport.render(full)
+
+    def find(self, text):
+        """Viewport offsets of the matches of `text` in the current viewport."""
+        return self.current_viewport.find(text)
+
+    def open(self, path, make_current=True):
+        """
+        Open a file in a new file-backed buffer and viewport.
+        The file is not read, only mapped when it is first displayed.
+        """
+        buffer = MappedBuffer(path, self.current_viewport.width, self.current_viewport.height)
+        viewport = Viewport(buffer)
+        self.buffers.append(buffer)
+        self.viewports.append(viewport)
+        if make_current:
+            self.current_viewport = viewport
+        return viewport
+
+
+class ConsolePump:
+    """
+    Asynchronous write path for a Console.
+
+    Producers put text into a bounded queue (`await pump.write(text)` waits
+    when it is full, which is the back pressure). A background task takes
+    everything queued, writes it to the console as one merged string and
+    renders at most `fps` frames per second, passing each frame's changed
+    rows to `output` (e.g. lambda changes: sys.stdout.write(Viewport.to_ansi(changes))).
+    """
+    def __init__(self, console, capacity=4096, fps=60, output=None):
+        self.console = console
+        self.queue = asyncio.Queue(capacity)
+        self.frame_interval = 1 / fps
+        self.output = output
+        self._task = None
+        self._last_frame = 0.0
+        # Stats: writes and characters accepted, frames rendered, and the
+        # time from write() to the frame that showed the text
+        self.writes = 0
+        self.chars = 0
+        self.frames = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _check(self):
+        """Raise the error that stopped the background task, if any."""
+        task = self._task
+        if task is not None and task.done() and not task.cancelled():
+            task.result()
+
+    async def _until_done_or_failed(self, aw):
+        """Await `aw`, unless the background task dies first (then raise its error)."""
+        if self._task is None:
+            await aw
+            return
+        waiter = asyncio.ensure_future(aw)
+        await asyncio.wait((waiter, self._task), return_when=asyncio.FIRST_COMPLETED)
+        if not waiter.done():
+            waiter.cancel()
+            self._check()
+        waiter.result()
+
+    async def write(self, text):
+        self._check()
+        item = (text, time.perf_counter())
+        if self.queue.full():
+            # Waiting for room: give up if the task that makes room dies
+            await self._until_done_or_failed(self.queue.put(item))
+        else:
+            self.queue.put_nowait(item)
+
+    def write_nowait(self, text):
+        """Like write(), raises asyncio.QueueFull instead of waiting."""
+        self._check()
+        self.queue.put_nowait((text, time.perf_counter()))
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Write and render everything still queued, then stop. Raises the
+        error of the background task if it failed. Does nothing if the
+        pump was never started.
+        """
+        if self._task is None:
+            return
+        await self._until_done_or_failed(self.queue.join())
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        self._render(time.perf_counter())
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _run(self):
+        queue = self.queue
+        pending_since = []  # enqueue times of text not rendered yet
+        while True:
+            text, queued_at = await queue.get()
+            parts = [text]
+            pending_since.append(queued_at)
+            while not queue.empty():
+                text, queued_at = queue.get_nowait()
+                parts.append(text)
+                pending_since.append(queued_at)
+
+            self.console.write(''.join(parts))
+            self.writes += len(parts)
+            self.chars += sum(len(part) for part in parts)
+            for _ in parts:
+                queue.task_done()
+
+            now = time.perf_counter()
+            wait = self._last_frame + self.frame_interval - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+            now = self._render(time.perf_counter())
+            for queued_at in pending_since:
+                latency = now - queued_at
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+            pending_since.clear()
+
+    def _render(self, now):
+        changes = self.console.render()
+        if self.output is not None and changes:
+            self.output(changes)
+        self.frames += 1
+        self._last_frame = now
+        return time.perf_counter()
+
+    def stats(self):
+        return {
+            'writes': self.writes,
+            'chars': self.chars,
+            'frames': self.frames,
+            'avg_latency_ms': self.latency_total / self.writes * 1000 if self.writes else 0.0,
+            'max_latency_ms': self.latency_max * 1000,
+        }
+
+
+if __name__ == '__main__':
+    # Example usage of the facade
+    c = Console()  # Create console instance
+    c.write('hello')  # Write text through the facade
+    ch = c.get_char_at(0)  # Get character through the facade
+
+    # Benchmark: frames per second with a steady stream of writes,
+    # redrawing only the rows that changed vs the whole window
+    for full in (True, False):
+        viewport = Viewport(Buffer(120, 50), follow=True)
+        frames = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < 1:
+            viewport.append(f"{frames:>9} ")
+            viewport.render(full)
+            frames += 1
+        print(f"{'full' if full else 'diff'} redraw: {frames} frames/sec")
+
+    # Tiling: 48 panes on one 240x72 screen, writes going to random panes
+    import random
+    compositor = Compositor(240, 72)
+    panes = []
+    for row in range(6):
+        for col in range(8):
+            pane = Viewport(Buffer(30, 12), follow=True)
+            compositor.add(pane, col * 30, row * 12)
+            panes.append(pane)
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 1:
+        random.choice(panes).append(f"{frames:>9} ")
+        compositor.frame()
+        frames += 1
+    print(f"{len(panes)} panes: {frames} frames/sec")
+
+    # A big file opened without reading it, scrolled by line number
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'big.log')
+        with open(path, 'w') as f:
+            f.writelines(f"log line {i}\n" for i in range(1_000_000))
+        console = Console()
+        viewport = console.open(path)
+        start = time.perf_counter()
+        viewport.scroll_to_line(500_000)
+        print(viewport.frame().split('\n')[0],
+              f"({(time.perf_counter() - start) * 1000:.0f} msec)")
+        console.write('appended\n')
+        viewport.buffer.close()
+
+    # Search: plain scan vs n-gram index for repeated queries
+    viewport = Viewport(Buffer(60, 20))
+    for i in range(50_000):
+        viewport.append(f"log line {i}\n")
+    buffer = viewport.buffer
+    start = time.perf_counter()
+    matches = buffer.find_all('line 7777')
+    scan = time.perf_counter() - start
+    buffer.enable_index(4)
+    buffer.find_all('line 1')  # builds the index
+    start = time.perf_counter()
+    indexed_matches = buffer.find_all('line 7777')
+    indexed = time.perf_counter() - start
+    assert matches == indexed_matches
+    print(f"{len(matches)} matches: scan {scan * 1000:.2f} msec, "
+          f"indexed {indexed * 1000:.2f} msec, first at offset {viewport.find('line 7777')[0]}")
+
+    # Asynchronous writes: 4 producers as fast as they can for one second
+    async def produce(pump, name, deadline):
+        count = 0
+        while time.perf_counter() < deadline:
+            await pump.write(f"{name}:{count} ")
+            count += 1
+
+    async def pump_benchmark():
+        console = Console()
+        console.current_viewport.follow = True
+        async with ConsolePump(console, fps=60) as pump:
+            start = time.perf_counter()
+            await asyncio.gather(*(produce(pump, f"p{i}", start + 1) for i in range(4)))
+        elapsed = time.perf_counter() - start
+        stats = pump.stats()
+        print(f"pump: {stats['writes'] / elapsed:,.0f} writes/sec, "
+              f"{stats['frames']} frames, avg latency {stats['avg_latency_ms']:.1f} msec, "
+              f"max {stats['max_latency_ms']:.1f} msec")
+
+    asyncio.run(pump_benchmark())
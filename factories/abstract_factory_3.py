@@ -1,27 +1,207 @@
+import os
+import threading
+
+
 class Person:
     def __init__(self, name, id):
         self.id = id
         self.name = name
-        
+
     def __str__(self):
         return f"Person(id={self.id}, name={self.name})"
-        
-    def __repr__(self): 
+
+    def __repr__(self):
         return f"Person({self.id}, {self.name})"
-        
+
+
+class LocalBlockSource:
+    """
+    Hands out blocks of ids from a counter inside this process.
+
+    A forked child gets a fresh lock and moves its counter to its own
+    range, pid << PID_SHIFT, so it never hands out the parent's ids or
+    the ids of a sibling that is alive at the same time. A pid can be
+    reused once its process has exited, and spawned processes start from
+    `start` again, so use FileBlockSource when ids must stay unique across
+    those too.
+    """
+    PID_SHIFT = 40
+
+    def __init__(self, start=0):
+        self._next = start
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):  # not on Windows, which can't fork
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._next = os.getpid() << self.PID_SHIFT
+
+    def reserve(self, size):
+        """Return the first id of a new block of `size` ids."""
+        with self._lock:
+            first = self._next
+            self._next += size
+            return first
+
+
+class FileBlockSource:
+    """
+    Hands out blocks of ids from a counter stored in a file, shared by
+    every process that uses the same path. The file is locked with flock
+    (Unix only) while the counter is read and bumped.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def reserve(self, size):
+        import fcntl  # Unix only, keep the module importable elsewhere
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            data = os.read(fd, 32)
+            first = int(data) if data.strip() else 0
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, str(first + size).encode())
+            return first
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+class IdAllocator:
+    """
+    HiLo style id allocator.
+
+    The process reserves a block of process_block ids from the source (the
+    shared "hi" part), every thread takes a smaller block of thread_block
+    ids from the process block, and then numbers people from its own block
+    without any lock. Only refilling a block touches a lock or the source.
+    Blocks are dropped in a forked child, which then reserves new ones from
+    the source; see LocalBlockSource for how far the default source keeps
+    forked processes apart.
+    """
+    def __init__(self, source=None, process_block=10_000, thread_block=100):
+        self.source = source if source is not None else LocalBlockSource()
+        self.process_block = process_block
+        self.thread_block = thread_block
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Remaining part of this process' block: [next, end)
+        self._process_next = self._process_end = 0
+
+    def _take(self, size):
+        """Ids [first, first + count) taken from the process block."""
+        with self._lock:
+            if self._process_next >= self._process_end:
+                block = max(size, self.process_block)
+                self._process_next = self.source.reserve(block)
+                self._process_end = self._process_next + block
+            first = self._process_next
+            count = min(size, self._process_end - first)
+            self._process_next += count
+            return first, count
+
+    def next_id(self):
+        block = getattr(self._local, 'block', None)
+        if block is None or block[0] >= block[1]:
+            first, count = self._take(self.thread_block)
+            block = self._local.block = [first, first + count]
+        new_id = block[0]
+        block[0] += 1
+        return new_id
+
+    def allocate(self, count):
+        """`count` unique ids, taken in as few blocks as possible."""
+        ids = []
+        while len(ids) < count:
+            first, taken = self._take(count - len(ids))
+            ids.extend(range(first, first + taken))
+        return ids
+
 
 class PersonFactory:
-    _id = 0
-    
+    # Shared by all factories; replace with IdAllocator(FileBlockSource(path))
+    # when several processes create people
+    allocator = IdAllocator()
+
     def create_person(self, name):
-        person = Person(name=name, id=PersonFactory._id)
-        PersonFactory._id += 1
-        return person
-        
-
-pf = PersonFactory()
-p1 = pf.create_person("Andriy")
-p2 = pf.create_person("John")
-p3 = pf.create_person("Jane")
-p4 = pf.create_person("Doe")
-print(p1, p2, p3, p4)
\ No newline at end of file
+        return Person(name=name, id=self.allocator.next_id())
+
+    def create_people(self, names):
+        names = list(names)
+        return [Person(name=name, id=new_id)
+                for name, new_id in zip(names, self.allocator.allocate(len(names)))]
+
+
+def _stress_worker(path, queue):
+    """Create people from 8 threads and send their ids back."""
+    if path is not None:
+        PersonFactory.allocator = IdAllocator(FileBlockSource(path), process_block=1000,
+                                              thread_block=50)
+    factory = PersonFactory()
+    ids = []
+
+    def create():
+        for i in range(2_000):
+            ids.append(factory.create_person(f"p{i}").id)
+        ids.extend(p.id for p in factory.create_people(["x"] * 500))
+
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.put(ids)
+
+
+def _stress(context, path):
+    """Ids created by 4 processes started with `context`, checked unique."""
+    queue = context.Queue()
+    processes = [context.Process(target=_stress_worker, args=(path, queue))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    all_ids = [i for _ in processes for i in queue.get()]
+    for process in processes:
+        process.join()
+    assert len(all_ids) == len(set(all_ids)), "duplicate ids"
+    return all_ids
+
+
+if __name__ == '__main__':
+    pf = PersonFactory()
+    p1 = pf.create_person("Andriy")
+    p2 = pf.create_person("John")
+    p3 = pf.create_person("Jane")
+    p4 = pf.create_person("Doe")
+    print(p1, p2, p3, p4)
+    print(pf.create_people(["Ann", "Bob"]))
+
+    # Stress test: 4 processes x 8 threads creating people, all ids unique.
+    # Needs fork and flock, so only where those exist (not on Windows).
+    if hasattr(os, 'fork'):
+        import multiprocessing as mp
+        import tempfile
+
+        # Forked children share the default allocator with this process, which
+        # already used a block; its later ids must not show up in the children
+        child_ids = _stress(mp.get_context('fork'), None)
+        # Enough to make this process reserve a new block after the fork
+        parent_ids = [p.id for p in pf.create_people(["q"] * 20_000)]
+        assert not set(child_ids) & set(parent_ids), "child reused parent ids"
+        print(f"fork, default source: {len(child_ids)} ids from 4 processes x 8 threads, "
+              f"all unique and none of the parent's")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'person_ids')
+            for method in mp.get_all_start_methods():
+                ids = _stress(mp.get_context(method), path)
+                print(f"{method}, file source: {len(ids)} ids from 4 processes x 8 threads, "
+                      f"all unique")